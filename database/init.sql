@@ -130,6 +130,14 @@ CREATE TABLE "order_items" (
 
 CREATE INDEX "idx_stations_geom" ON "stations" USING GIST ("location");
 
+CREATE INDEX "idx_restaurants_cuisines" ON "restaurants" USING GIN ("cuisines");
+
+CREATE INDEX "idx_restaurants_station_id" ON "restaurants" ("station_id");
+
+CREATE INDEX "idx_chargers_station_connector" ON "chargers" ("station_id", "connector_type");
+
+CREATE INDEX "idx_reservations_end" ON "reservations" ("reservation_end");
+
 ALTER TABLE "settings" ADD FOREIGN KEY ("customer_id") REFERENCES "users" ("user_id") ON DELETE CASCADE;
 
 ALTER TABLE "restaurants" ADD FOREIGN KEY ("station_id") REFERENCES "stations" ("station_id") ON DELETE CASCADE;
@@ -1,8 +1,8 @@
 # processor/app/config.py
 import os
-import logging
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
+from app.log_pipeline import configure_logging
 
 
 load_dotenv()  # For local development
@@ -13,13 +13,99 @@ class Settings(BaseSettings):
     JWT_SECRET: str = os.getenv("JWT_SECRET", "")
     JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Async engine, defaults to DATABASE_URL with the asyncpg driver
+    ASYNC_DATABASE_URL: str | None = None
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 5.0  # s, waiting for a free connection
+    DB_POOL_RECYCLE: int = 30 * 60  # s
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 5000
     OPEN_ROUTE_SERVICE_API_KEY: str = os.getenv("OPEN_ROUTE_SERVICE_API_KEY")
+    # Routing backend, "ors" for the hosted OpenRouteService, "local" for the built-in engine
+    ROUTING_BACKEND: str = "ors"
+    LOCAL_ROUTING_GRAPH: str = "data/road_graph.npz"  # python -m app.services.local_routing <extract> <graph>
+    LOCAL_ROUTING_MAX_SNAP_DISTANCE: float = 5000  # m, from a location to the nearest road node
+    LOCAL_ROUTING_MAX_CONCURRENCY: int = 2  # searches at a time, CPU bound
+    # OpenRouteService client settings
+    ORS_BASE_URL: str = "https://api.openrouteservice.org"
+    ORS_MAX_CONNECTIONS: int = 20
+    ORS_MAX_CONCURRENCY: int = 10
+    ORS_TIMEOUT: float = 10.0  # s, per call
+    ORS_HTTP2: bool = True
+    ORS_MATRIX_MAX_ROUTES: int = 3500  # sources x destinations per matrix request
+    ORS_MATRIX_CHUNK_SIZE: int = 50  # destinations per concurrent request for a single origin
+    # Outgoing ORS rate limits, per worker, defaults are the free plan key limits
+    ORS_SCHEDULER_ENABLED: bool = True
+    ORS_DIRECTIONS_PER_MINUTE: int = 40
+    ORS_DIRECTIONS_PER_DAY: int | None = 2000
+    ORS_MATRIX_PER_MINUTE: int = 40
+    ORS_MATRIX_PER_DAY: int | None = 500
+    ORS_QUEUE_TIMEOUT: float = 10.0  # s, longest wait for a rate limit slot
+    ORS_RETRY_ATTEMPTS: int = 3  # on 429
+    ORS_BACKOFF_BASE: float = 0.5  # s, doubled per attempt, full jitter
+    ORS_BACKOFF_MAX: float = 8.0  # s
+    # Route cache, keyed on origin/destination snapped to ROUTE_CACHE_GRID degrees
+    ROUTE_CACHE_SIZE: int = 512
+    ROUTE_CACHE_TTL: int = 6 * 60 * 60  # s
+    ROUTE_CACHE_GRID: float = 0.005  # ~500 m north-south at Finnish latitudes
+    # ETA cache for ORS matrix results, backend is "sqlite", "redis" or "none"
+    MATRIX_CACHE_BACKEND: str = "sqlite"
+    MATRIX_CACHE_PATH: str = "/tmp/processor_matrix_cache.sqlite3"
+    MATRIX_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    MATRIX_CACHE_SQLITE_TIMEOUT: float = 0.2  # s, waiting on another worker's write lock
+    MATRIX_CACHE_TTL: int = 15 * 60  # s
+    MATRIX_CACHE_GRID: float = 0.002  # ~200 m
+    MATRIX_CACHE_PURGE_INTERVAL: float = 10 * 60  # s, deletes expired SQLite rows
+    # Station lookup: "db" queries PostGIS per request, "memory" uses the in-process station catalog
+    STATION_LOOKUP_MODE: str = "db"
+    STATION_CATALOG_REFRESH_INTERVAL: float = 60  # s
+    STATION_CATALOG_FULL_RELOAD_INTERVAL: float = 60 * 60  # s
+    STATION_CANDIDATE_TOP_K: int = 50  # nearest stations along the route sent to ORS, 0 keeps all
+    # Reservation-aware filtering, "drop" removes chargers booked around the arrival, "annotate" flags them, "off"
+    AVAILABILITY_MODE: str = "drop"
+    AVAILABILITY_MARGIN: float = 10 * 60  # s, around arrival to end of charging
+    AVAILABILITY_REFRESH_INTERVAL: float = 15  # s
+    AVAILABILITY_FULL_RELOAD_INTERVAL: float = 5 * 60  # s, picks up shifted and cancelled reservations
+    # Reservations per /calculate-eta-batch request, each is a bind parameter of the destination lookup
+    ETA_BATCH_MAX_SIZE: int = 1000
+    # Live-ETA tracking sessions
+    TRACKING_SESSION_TTL: int = 30 * 60  # s since the last position update
+    TRACKING_SESSION_MAX: int = 10000
+    TRACKING_OFF_ROUTE_DISTANCE: float = 300  # m, re-route beyond this
+    TRACKING_STORE_PATH: str = "/tmp/processor_tracking.sqlite3"  # shared by the workers on one host
+    TRACKING_STORE_TIMEOUT: float = 1.0  # s
     # CORS settings
     CORS_ORIGINS: list[str] = [
         "http://localhost:5173", "https://app.localhost", "http://localhost:3000", "https://backend.localhost"
     ]
     CORS_HEADERS: list[str] = ["*"]
     CORS_METHODS: list[str] = ["POST", "GET", "OPTIONS", "PATCH", "PUT"]
+    # Load models and open the DB pool in the background at startup, otherwise on first use
+    WARMUP_ON_STARTUP: bool = True
+    WARMUP_RETRY_INTERVAL: float = 2.0  # s
+    # Tracing, "none", "console" or "otlp" (needs processor[otel], endpoint from OTEL_EXPORTER_OTLP_ENDPOINT)
+    OTEL_EXPORTER: str = "none"
+    OTEL_SERVICE_NAME: str = "processor"
+    # Requests sending this header get their stage timings back in a Server-Timing header
+    DEBUG_TIMINGS_HEADER: str = "X-Debug-Timings"
+    # Logging, "json" or "text", written from a background thread
+    LOG_FORMAT: str = "json"
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_SIZE: int = 10000  # records, further ones are dropped and counted
+    # Fraction of INFO records kept per route template, warnings and errors are always kept
+    LOG_SAMPLE_RATE: float = 1.0
+    LOG_SAMPLE_RATES: dict[str, float] = {
+        "/api/calculate-eta": 0.05,
+        "/api/calculate-eta-batch": 0.05,
+        "/api/tracking-sessions/{session_id}/position": 0.05,
+        "/health": 0.0,
+        "/ready": 0.0,
+        "/metrics": 0.0,
+    }
+    # Verified JWT payloads, kept until exp and at most TOKEN_CACHE_TTL
+    TOKEN_CACHE_SIZE: int = 4096
+    TOKEN_CACHE_TTL: float = 5 * 60  # s
 
     class Config:
         env_file = ".env"
@@ -27,8 +113,12 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-logger = logging.getLogger("app_logger")
-logger.setLevel(logging.INFO)
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-logger.addHandler(console_handler)
+log_pipeline = configure_logging(
+    "app_logger",
+    level=settings.LOG_LEVEL,
+    log_format=settings.LOG_FORMAT,
+    sample_rates=settings.LOG_SAMPLE_RATES,
+    default_sample_rate=settings.LOG_SAMPLE_RATE,
+    queue_size=settings.LOG_QUEUE_SIZE,
+)
+logger = log_pipeline.logger
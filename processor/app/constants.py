@@ -1,3 +1,6 @@
 BUFFERED_ZONE = 3000  # m
 MINIMUM_SOC_AT_ARRIVAL = 2
 TEMPERATURE = 5  # Average annual in Lahti
+ROUTE_SIMPLIFY_TOLERANCE = 50  # m, Douglas-Peucker tolerance before buffering
+CHARGING_TIME_MODEL_PATH = "app/trained_models/sample_time_predictor_LGBM_compressed.pkl"
+CHARGING_TIME_TABLE_PATH = "app/trained_models/charging_time_table.npy"  # Built by python -m app.services.charging_table
@@ -1,10 +1,41 @@
-from sqlmodel import Session, create_engine
+import asyncio
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlmodel import text
 from app.config import settings
 
 
-engine = create_engine(settings.DATABASE_URL)
+def get_async_database_url():
+    # DATABASE_URL is shared with the sync tooling (postgresql+psycopg2://...), swap in the asyncpg driver
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
 
+    return make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg")
 
-def get_session():
-    with Session(engine) as session:
+
+engine = create_async_engine(
+    get_async_database_url(),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args={
+        "server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)},
+        "command_timeout": settings.DB_STATEMENT_TIMEOUT_MS / 1000 + 1,
+    },
+)
+
+
+async def get_session():
+    async with AsyncSession(engine) as session:
         yield session
+
+
+async def warm_up_database():
+    # Opens the pooled connections up front, used by the readiness probe
+    async def ping():
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(settings.DB_POOL_SIZE)))
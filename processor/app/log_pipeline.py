@@ -0,0 +1,155 @@
+import atexit
+import logging
+import os
+import queue
+import random
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+
+# Set per request by the log_requests middleware: {"scope": ASGI scope, "keep": sampling decision}
+request_log = ContextVar("request_log", default=None)
+
+# Attributes every LogRecord has, anything else came in through extra=
+RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg and the extra= fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        message = record.getMessage()
+        return f"{message}\n{record.exc_text}" if record.exc_text else message
+
+
+class RouteSampler(logging.Filter):
+    """Keeps a fraction of the INFO and DEBUG records of a request, per route template.
+
+    Decided once per request, so a request's records are kept or dropped together.
+    Warnings, errors and records outside a request are always kept.
+    """
+
+    def __init__(self, rates, default_rate):
+        super().__init__()
+        self.rates = rates  # route template: fraction kept
+        self.default_rate = default_rate
+        self.kept = 0
+        self.dropped = 0
+        self.dropped_by_route = {}
+
+    def filter(self, record):
+        context = request_log.get()
+        if context is None or record.levelno >= logging.WARNING:
+            return True
+
+        if context["keep"] is None:
+            # The route is in the scope once the router matched it, before that the raw path stands in
+            route = context["scope"].get("route")
+            template = route.path if route is not None else context["scope"]["path"]
+            context["keep"] = random.random() < self.rates.get(template, self.default_rate)
+            context["route"] = template
+
+        if context["keep"]:
+            self.kept += 1
+            return True
+
+        self.dropped += 1
+        self.dropped_by_route[context["route"]] = self.dropped_by_route.get(context["route"], 0) + 1
+        return False
+
+
+class LazyQueueHandler(QueueHandler):
+    """Enqueues records unformatted, the listener thread builds the message.
+
+    The stdlib QueueHandler formats in the caller, which is the event loop here.
+    A full queue drops the record rather than blocking a request.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.overflow = 0
+
+    def prepare(self, record):
+        # Tracebacks hold frames, render them now, the rest stays lazy
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        # Same for an exception passed as a %s argument, its traceback holds frames too
+        if isinstance(record.args, tuple) and any(isinstance(arg, BaseException) for arg in record.args):
+            record.args = tuple(str(arg) if isinstance(arg, BaseException) else arg for arg in record.args)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.overflow += 1
+
+
+class LogPipeline:
+    def __init__(self, logger, handler, listener, sampler):
+        self.logger = logger
+        self.handler = handler
+        self.listener = listener
+        self.sampler = sampler
+
+    def start(self):
+        self.resume()
+        # The listener thread does not survive a fork (app.server), stop it around the fork and restart on both sides
+        os.register_at_fork(before=self.stop, after_in_parent=self.resume, after_in_child=self.resume)
+        atexit.register(self.stop)
+
+    def resume(self):
+        if self.listener._thread is None:
+            self.listener.start()
+
+    def stop(self):
+        # Flushes what is queued, safe to call twice
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def stats(self):
+        return {
+            "queued": self.handler.queue.qsize(),
+            "overflow": self.handler.overflow,
+            "sampled_kept": self.sampler.kept,
+            "sampled_out": self.sampler.dropped,
+            "sampled_out_by_route": dict(self.sampler.dropped_by_route),
+        }
+
+
+def configure_logging(name, level, log_format, sample_rates, default_sample_rate, queue_size):
+    """The app logger, writing to stderr from a listener thread through a bounded queue."""
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.propagate = False
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+    log_queue = queue.Queue(queue_size)
+    handler = LazyQueueHandler(log_queue)
+    sampler = RouteSampler(sample_rates, default_sample_rate)
+    handler.addFilter(sampler)
+    logger.addHandler(handler)
+
+    pipeline = LogPipeline(logger, handler, QueueListener(log_queue, stream_handler), sampler)
+    pipeline.start()
+    return pipeline
@@ -1,6 +1,22 @@
 # processor/app/main.py
-from fastapi import FastAPI, Depends, HTTPException, Request, status
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from time import perf_counter
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from app.routers.agent import router as agent_router
+from app.services.open_route import client as ors_client, matrix_cache
+from app.services.model_registry import registry
+from app.dependencies.database import engine, warm_up_database
+from app.services.station_catalog import station_catalog
+from app.services.charger_availability import charger_availability
+from app.services.token_cache import token_cache
+from app.log_pipeline import request_log
+from app.services.metrics import configure_tracing, request_timings, server_timing, stats_collector, \
+    HTTP_REQUEST_SECONDS
+from prometheus_client import generate_latest, multiprocess, CollectorRegistry, CONTENT_TYPE_LATEST
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from jose import jwt, JWTError
@@ -9,7 +25,105 @@ from app.config import settings, logger
 # JWT Bearer token security scheme
 security = HTTPBearer()
 
-app = FastAPI(title=settings.APP_NAME)
+
+# Flipped by warm_up, reported by /ready
+readiness = {"database": False}
+
+
+async def load_station_catalog(full=True):
+    async with AsyncSession(engine) as session:
+        if full:
+            await station_catalog.load(session)
+        else:
+            await station_catalog.refresh(session)
+
+
+async def load_charger_availability(full=True):
+    async with AsyncSession(engine) as session:
+        if full:
+            await charger_availability.load(session)
+        else:
+            await charger_availability.refresh(session)
+
+
+async def keep_refreshed(name, load, is_loaded, refresh_interval, full_reload_interval):
+    while not is_loaded():
+        try:
+            await load()
+        except Exception as e:
+            logger.warning("%s load failed, retrying: %s", name, e, extra={"component": name})
+            await asyncio.sleep(settings.WARMUP_RETRY_INTERVAL)
+
+    # Incremental refresh by created_at watermark, with a periodic full reload for updates and deletes
+    since_full_reload = 0.0
+    while True:
+        await asyncio.sleep(refresh_interval)
+        since_full_reload += refresh_interval
+        full = since_full_reload >= full_reload_interval
+
+        try:
+            await load(full)
+            if full:
+                since_full_reload = 0.0
+        except Exception as e:
+            logger.warning("%s refresh failed: %s", name, e, extra={"component": name})
+
+
+async def purge_matrix_cache():
+    while True:
+        await asyncio.sleep(settings.MATRIX_CACHE_PURGE_INTERVAL)
+        try:
+            await matrix_cache.purge_expired()
+        except Exception as e:
+            logger.warning("Matrix cache purge failed: %s", e)
+
+
+async def warm_up():
+    try:
+        await run_in_threadpool(registry.warm_up)
+    except Exception as e:
+        logger.error("Model warm-up failed: %s", e)
+
+    while not readiness["database"]:
+        try:
+            await warm_up_database()
+            readiness["database"] = True
+            logger.info("Database pool warmed up")
+        except Exception as e:
+            logger.warning("Database warm-up failed, retrying: %s", e)
+            await asyncio.sleep(settings.WARMUP_RETRY_INTERVAL)
+
+    refreshers = [purge_matrix_cache()]
+    if settings.STATION_LOOKUP_MODE == "memory":
+        refreshers.append(keep_refreshed(
+            "Station catalog", load_station_catalog, station_catalog.is_loaded,
+            settings.STATION_CATALOG_REFRESH_INTERVAL, settings.STATION_CATALOG_FULL_RELOAD_INTERVAL
+        ))
+    if settings.AVAILABILITY_MODE != "off":
+        # Not part of readiness, stations are returned unfiltered until the first load
+        refreshers.append(keep_refreshed(
+            "Charger availability", load_charger_availability, lambda: charger_availability.loaded,
+            settings.AVAILABILITY_REFRESH_INTERVAL, settings.AVAILABILITY_FULL_RELOAD_INTERVAL
+        ))
+
+    await asyncio.gather(*refreshers)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so /health answers immediately
+    warm_up_task = asyncio.create_task(warm_up()) if settings.WARMUP_ON_STARTUP else None
+    yield
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    # Release pooled OpenRouteService and database connections
+    await ors_client.aclose()
+    await engine.dispose()
+
+
+configure_tracing(settings.OTEL_EXPORTER, settings.OTEL_SERVICE_NAME)
+
+app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -27,12 +141,32 @@ async def log_requests(request: Request, call_next):
     path = request.url.path
     method = request.method
 
-    logger.info(f"Request: {method} {path}")
+    # Records of this request are sampled together, by route (LOG_SAMPLE_RATES)
+    request_log.set({"scope": request.scope, "keep": None})
+
+    # Collect stage timings only when the caller asks for them
+    timings = [] if settings.DEBUG_TIMINGS_HEADER in request.headers else None
+    request_timings.set(timings)
+    start = perf_counter()
 
     # Continue processing the request
     response = await call_next(request)
-
-    logger.info(f"Response status: {response.status_code}")
+    elapsed = perf_counter() - start
+
+    # Route template, not the raw path, to keep ids out of the labels
+    route = request.scope.get("route")
+    route_path = route.path if route else "unmatched"
+    HTTP_REQUEST_SECONDS.labels(method=method, route=route_path, status=response.status_code).observe(elapsed)
+
+    if timings is not None:
+        timings.append(("total", perf_counter() - start))
+        response.headers["Server-Timing"] = server_timing(timings)
+
+    # One record per request, formatted by the log listener thread
+    logger.info("%s %s %s", method, path, response.status_code, extra={
+        "method": method, "path": path, "route": route_path, "status": response.status_code,
+        "duration_ms": round(elapsed * 1000, 2)
+    })
     return response
 
 
@@ -40,9 +174,10 @@ async def log_requests(request: Request, call_next):
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
 
-    # Log token info (careful not to log the entire token in production)
-    token_preview = token[:10] + "..." if len(token) > 10 else token
-    logger.info(f"Verifying token: {token_preview}")
+    # Polling clients send the same token over and over, it was verified the first time
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
 
     if not settings.JWT_SECRET:
         logger.error("JWT_SECRET not configured")
@@ -55,11 +190,13 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
         payload = jwt.decode(
             token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
         )
-        logger.info(f"Token verified successfully. Payload: {payload}")
+        # Claims stay out of the logs
+        logger.debug("Token verified for subject %s", payload.get("sub"), extra={"sub": payload.get("sub")})
+        token_cache.set(token, payload)
 
         return payload
     except JWTError as e:
-        logger.error(f"JWT verification failed: {str(e)}")
+        logger.warning("JWT verification failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
@@ -71,6 +208,34 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
 async def health_check():
     return {"status": "healthy"}
 
+
+@app.get("/metrics")
+async def metrics():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Under app.server, histograms and counters summed over all workers, stats gauges of this worker
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(stats_collector)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    catalog_ready = settings.STATION_LOOKUP_MODE != "memory" or station_catalog.is_loaded()
+    ready = registry.is_ready() and readiness["database"] and catalog_ready
+
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    return {
+        "status": "ready" if ready else "warming_up",
+        "models": registry.status(),
+        "database": readiness["database"],
+        "station_catalog": station_catalog.stats() if settings.STATION_LOOKUP_MODE == "memory" else None
+    }
+
 # Include your routers
 app.include_router(agent_router)
 
@@ -1,9 +1,9 @@
 from typing import List
 from datetime import datetime
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import String
+from sqlalchemy import String, DateTime
 from sqlalchemy import Column
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import ARRAY, ENUM
 from geoalchemy2 import Geography
 
 
@@ -48,7 +48,10 @@ class Charger(SQLModel, table=True):
     charger_id: int = Field(primary_key=True)
     station_id: int = Field(foreign_key="stations.station_id", nullable=False)
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
-    connector_type: str
+    # Native enum, so bound parameters are typed connector_type rather than varchar
+    connector_type: str = Field(
+        sa_column=Column(ENUM("CCS", "CHAdeMO", "Type 2", name="connector_type", create_type=False), nullable=False)
+    )
     power: int
     # Relationships
     station: Station = Relationship(back_populates="chargers")
@@ -60,5 +63,9 @@ class Reservation(SQLModel, table=True):
 
     reservation_id: int = Field(primary_key=True)
     charger_id: int = Field(foreign_key="chargers.charger_id", nullable=False)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    # Time the charger is booked for, timestamptz
+    reservation_start: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    reservation_end: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
     # Relationships
     charger: Charger = Relationship(back_populates="reservations")
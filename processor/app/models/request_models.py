@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from app.config import settings
 
 
 class StationRequest(BaseModel):
@@ -17,7 +18,20 @@ class ETACalculationRequest(BaseModel):
     reservation_id: int
 
 
+class ETABatchRequest(BaseModel):
+    reservations: list[ETACalculationRequest] = Field(min_length=1, max_length=settings.ETA_BATCH_MAX_SIZE)
+
+
 class RouteRequest(BaseModel):
     source: tuple[float, float]
     station_id: int
-    interval: int
+    interval: int = Field(gt=0)  # min
+
+
+class TrackingSessionRequest(BaseModel):
+    current_location: tuple[float, float]
+    reservation_id: int
+
+
+class PositionUpdate(BaseModel):
+    current_location: tuple[float, float]
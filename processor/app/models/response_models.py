@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+import orjson
+from fastapi.responses import JSONResponse
+
+
+# Frozen and slotted: shared between queries (the station catalog builds them once), serialized natively by orjson
+@dataclass(slots=True, frozen=True)
+class RestaurantResult:
+    restaurant_id: int
+    station_id: int
+    name: str
+    address: str
+    cuisines: list[str]
+
+
+@dataclass(slots=True, frozen=True)
+class ChargerResult:
+    charger_id: int
+    type: str
+    max_power: int  # kW
+
+
+@dataclass(slots=True, frozen=True)
+class AnnotatedCharger(ChargerResult):
+    # AVAILABILITY_MODE=annotate
+    available: bool
+
+
+@dataclass(slots=True, frozen=True)
+class StationResult:
+    station_id: int
+    name: str
+    address: str
+    restaurants: list[RestaurantResult]
+    chargers: list[ChargerResult]
+    travel_time_min: int
+    distance_km: float
+    soc_at_arrival: int
+    estimate_charging_time_min: int
+
+
+@dataclass(slots=True, frozen=True)
+class AnnotatedStation(StationResult):
+    available: bool
+
+
+@dataclass(slots=True, frozen=True)
+class CandidateResult:
+    # First /get-filtered-stations/stream frame, distance_km as the crow flies
+    station_id: int
+    name: str
+    address: str
+    location: tuple[float, float]
+    restaurants: list[RestaurantResult]
+    chargers: list[ChargerResult]
+    distance_km: float
+
+
+@dataclass(slots=True, frozen=True)
+class StationEta:
+    station_id: int
+    travel_time_min: int
+    distance_km: float
+
+
+@dataclass(slots=True, frozen=True)
+class DestinationEta:
+    station_id: int
+    location: tuple[float, float]
+    travel_time_min: int
+    distance_km: float
+
+
+def dumps(content):
+    # Integer keys (reservation ids) become strings like with json.dumps
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON rendered by orjson, dataclasses included.
+
+    Returned directly from the /api routes, which skips FastAPI's jsonable_encoder pass.
+    """
+
+    def render(self, content):
+        return dumps(content)
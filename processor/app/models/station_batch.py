@@ -0,0 +1,109 @@
+import numpy as np
+from app.models.response_models import StationResult, AnnotatedStation, CandidateResult, StationEta
+
+
+class StationBatch:
+    """Stations between the pipeline stages, one column per field.
+
+    Lookup fills the station columns, the ETA, charging and availability stages
+    add theirs. Stages never change a batch, they return a new one (take,
+    with_columns) sharing the untouched columns.
+    """
+
+    __slots__ = ("station_id", "lon", "lat", "name", "address", "restaurants", "chargers", "max_power",
+                 "travel_time_min", "distance_km", "soc_at_arrival", "estimate_charging_time_min", "available")
+
+    ARRAYS = ("station_id", "lon", "lat", "max_power", "travel_time_min", "distance_km", "soc_at_arrival",
+              "estimate_charging_time_min", "available")
+
+    def __init__(self, station_id, lon, lat, name, address, restaurants, chargers, max_power, **columns):
+        self.station_id = station_id  # int64
+        self.lon = lon  # float64
+        self.lat = lat
+        self.name = name  # lists, one entry per station
+        self.address = address
+        self.restaurants = restaurants  # lists of RestaurantResult
+        self.chargers = chargers  # lists of ChargerResult, the requested connector type only
+        self.max_power = max_power  # kW of the first charger, what the charging estimate uses
+        # Set by the later stages
+        self.travel_time_min = columns.get("travel_time_min")  # int64
+        self.distance_km = columns.get("distance_km")  # float64
+        self.soc_at_arrival = columns.get("soc_at_arrival")  # int64
+        self.estimate_charging_time_min = columns.get("estimate_charging_time_min")  # int64
+        self.available = columns.get("available")  # bool, AVAILABILITY_MODE=annotate only
+
+    @classmethod
+    def from_rows(cls, station_ids, lon, lat, names, addresses, restaurants, chargers):
+        return cls(
+            np.asarray(station_ids, dtype=np.int64),
+            np.asarray(lon, dtype=np.float64),
+            np.asarray(lat, dtype=np.float64),
+            names,
+            addresses,
+            restaurants,
+            chargers,
+            np.fromiter((c[0].max_power for c in chargers), dtype=np.float64, count=len(chargers)),
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls.from_rows([], [], [], [], [], [], [])
+
+    def __len__(self):
+        return len(self.station_id)
+
+    def _columns(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def with_columns(self, **columns):
+        return StationBatch(**{**self._columns(), **columns})
+
+    def take(self, idx):
+        # Rows at positions idx (int array or boolean mask), in that order
+        idx = np.asarray(idx)
+        if idx.dtype == bool:
+            idx = np.flatnonzero(idx)
+        positions = idx.tolist()
+
+        columns = {}
+        for name, column in self._columns().items():
+            if column is None:
+                columns[name] = None
+            elif name in self.ARRAYS:
+                columns[name] = column[idx]
+            else:
+                columns[name] = [column[i] for i in positions]
+        return StationBatch(**columns)
+
+    def locations(self):
+        return list(zip(self.lon.tolist(), self.lat.tolist()))
+
+    def candidates(self, distance_km):
+        return [
+            CandidateResult(*row) for row in zip(
+                self.station_id.tolist(), self.name, self.address, self.locations(), self.restaurants,
+                self.chargers, np.round(distance_km, 2).tolist()
+            )
+        ]
+
+    def etas(self):
+        return [
+            StationEta(*row) for row in zip(
+                self.station_id.tolist(), self.travel_time_min.tolist(), self.distance_km.tolist()
+            )
+        ]
+
+    def results(self):
+        # Needs the ETA and charging columns, unless empty
+        if not len(self):
+            return []
+
+        rows = zip(
+            self.station_id.tolist(), self.name, self.address, self.restaurants, self.chargers,
+            self.travel_time_min.tolist(), self.distance_km.tolist(), self.soc_at_arrival.tolist(),
+            self.estimate_charging_time_min.tolist()
+        )
+        if self.available is None:
+            return [StationResult(*row) for row in rows]
+        return [AnnotatedStation(*row, available) for row, available in zip(rows, self.available.tolist())]
+
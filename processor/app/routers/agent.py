@@ -1,93 +1,292 @@
 from app.dependencies.database import get_session
-from app.services.open_route import get_location_range, get_driving_etas, get_route_locations, RoutingServiceError
-from app.services.charging_estimation import get_estimate_charging_time
-from app.services.database import get_stations_from_db, get_destination_by_reservation_id, get_destination_by_station_id
-from app.models.request_models import StationRequest, ETACalculationRequest, RouteRequest
-from app.config import logger
-from sqlmodel import Session
+from app.services.open_route import get_location_range, get_ranked_candidates, get_driving_etas, get_travel_times, \
+    get_route_locations, travel_time_columns, RoutingServiceError, route_cache, matrix_cache, route_flights, \
+    matrix_flights, scheduler
+from app.services.route_sampling import haversine_km
+from app.services.ors_scheduler import ors_priority, BACKGROUND
+from app.services.charging_estimation import get_estimate_charging_time, get_reachable_range
+from app.services.database import get_stations_from_db, get_destination_by_reservation_id, get_destination_by_station_id, \
+    get_destinations_by_reservation_ids, station_lookups
+from app.models.request_models import StationRequest, ETACalculationRequest, ETABatchRequest, RouteRequest, \
+    TrackingSessionRequest, PositionUpdate
+from app.models.response_models import DestinationEta, OrjsonResponse, dumps
+from app.services.station_catalog import station_catalog
+from app.services.charger_availability import charger_availability
+from app.services.tracking import tracking_sessions
+from app.services.metrics import timed, stats_collector
+from app.services.token_cache import token_cache
+from app.config import settings, logger, log_pipeline
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import numpy as np
 
 
 router = APIRouter(
     prefix="/api",
+    default_response_class=OrjsonResponse,
 )
 
 
-@router.post("/get-filtered-stations")
-def get_filtered_stations(
-    body: StationRequest,
-    session: Session = Depends(get_session)
-):
+async def find_stations(body):
     # Get location range - by OpenRouteService
-    current_location = body.current_location
     try:
-        buffer_geojson = get_location_range(body.current_location, body.destination)
+        with timed("route_corridor"):
+            buffer_polygon = await get_location_range(body.current_location, body.destination)
     except RoutingServiceError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    logger.info("Received buffer_geojson from OpenRouteService")
+    logger.info("Received route corridor from OpenRouteService")
+
+    # Get stations within a route, from the in-memory catalog when enabled and loaded
+    with timed("station_lookup"):
+        if settings.STATION_LOOKUP_MODE == "memory" and station_catalog.is_loaded():
+            stations = station_catalog.query(buffer_polygon, body.cuisines, body.connector_type)
+        else:
+            stations = await get_stations_from_db(buffer_polygon, body.cuisines, body.connector_type)
+
+    # Only stations the car can reach, nearest along the route first, go on to ORS
+    with timed("candidate_ranking"):
+        return await get_ranked_candidates(body.current_location, body.destination, stations,
+                                           get_reachable_range(body.current_soc, body.current_car_range),
+                                           settings.STATION_CANDIDATE_TOP_K)
 
-    # Get stations from database within a route
-    stations = get_stations_from_db(session, buffer_geojson, body.cuisines, body.connector_type)
+
+@router.post("/get-filtered-stations")
+async def get_filtered_stations(body: StationRequest):
+    current_location = body.current_location
+    stations = await find_stations(body)
 
     if not len(stations):
-        return []
+        return OrjsonResponse([])
 
     # Get ETAs - by OpenRouteService
     try:
-        stations_with_eta = get_driving_etas(current_location, stations)
+        with timed("eta_matrix"):
+            stations_with_eta = await get_driving_etas(current_location, stations)
     except RoutingServiceError as e:
         raise HTTPException(status_code=400, detail=str(e))
     logger.info("Received driving ETAa from OpenRouteService")
 
     # Calculate the charging time
-    stations_with_charging_time = get_estimate_charging_time(body.ev_model, body.current_soc, body.current_car_range,
-                                                             body.desired_soc, stations_with_eta)
+    with timed("charging_estimate"):
+        stations_with_charging_time = await run_in_threadpool(get_estimate_charging_time, body.ev_model,
+                                                              body.current_soc, body.current_car_range,
+                                                              body.desired_soc, stations_with_eta)
+
+    # Chargers booked between arrival and the end of charging, from the in-memory reservation index
+    with timed("availability"):
+        stations_available = charger_availability.filter_stations(stations_with_charging_time)
 
     # Sort by distance
-    stations_sorted = sorted(stations_with_charging_time, key=lambda x: x["distance_km"])
+    stations_sorted = stations_available.take(np.argsort(stations_available.distance_km, kind="stable"))
+
+    return OrjsonResponse(stations_sorted.results())
+
+
+def ndjson_frame(frame_type, stations):
+    return dumps({"type": frame_type, "stations": stations}) + b"\n"
+
+
+@router.post("/get-filtered-stations/stream")
+async def stream_filtered_stations(body: StationRequest):
+    # Route and DB errors still surface as a plain HTTP error, before the stream starts
+    stations = await find_stations(body)
+    lon, lat = body.current_location
+
+    async def frames():
+        # 1. Candidates straight from the DB, with a straight-line distance estimate
+        yield ndjson_frame("candidates", stations.candidates(haversine_km(lon, lat, stations.lon, stations.lat)))
+
+        if not len(stations):
+            yield ndjson_frame("done", [])
+            return
+
+        # 2. Driving ETAs - by OpenRouteService
+        try:
+            with timed("eta_matrix"):
+                stations_with_eta = await get_driving_etas(body.current_location, stations)
+        except RoutingServiceError as e:
+            yield dumps({"type": "error", "detail": str(e)}) + b"\n"
+            return
 
-    return stations_sorted
+        yield ndjson_frame("eta", stations_with_eta.etas())
+
+        # 3. Charging times, the final list is the same as /get-filtered-stations returns
+        with timed("charging_estimate"):
+            stations_with_charging_time = await run_in_threadpool(get_estimate_charging_time, body.ev_model,
+                                                                  body.current_soc, body.current_car_range,
+                                                                  body.desired_soc, stations_with_eta)
+
+        with timed("availability"):
+            stations_available = charger_availability.filter_stations(stations_with_charging_time)
+
+        stations_sorted = stations_available.take(np.argsort(stations_available.distance_km, kind="stable"))
+        yield ndjson_frame("done", stations_sorted.results())
+
+    return StreamingResponse(frames(), media_type="application/x-ndjson")
+
+
+def destination_etas(destinations, values):
+    # None where ORS found no route
+    routable, columns = travel_time_columns(values)
+    return [
+        DestinationEta(destination["station_id"], tuple(destination["location"]), travel_time_min, distance_km)
+        if ok else None
+        for destination, ok, travel_time_min, distance_km in zip(
+            destinations, routable.tolist(), columns["travel_time_min"].tolist(), columns["distance_km"].tolist()
+        )
+    ]
 
 
 @router.post("/calculate-eta")
-def calculate_eta(
+async def calculate_eta(
     body: ETACalculationRequest,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
+    # Polled by the backend, waits behind station searches for ORS slots
+    ors_priority.set(BACKGROUND)
+
     # Get destination station location
-    destination_station = get_destination_by_reservation_id(session, body.reservation_id)
+    destination_station = await get_destination_by_reservation_id(session, body.reservation_id)
 
     if not destination_station:
         raise HTTPException(status_code=404, detail=f"Station not found for reservation with reservation_id {body.reservation_id}")
     
-    destination_locations = [
-        {
-            "location": destination_station  # To match further call from OpenRouteService
-        }
-    ]
-
     # Get ETA and distance
     try:
-        station_with_eta = get_driving_etas(body.current_location, destination_locations)
+        with timed("eta_matrix"):
+            values = await get_travel_times([
+                (body.current_location, destination_station["station_id"], destination_station["location"])
+            ])
     except RoutingServiceError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    return station_with_eta[0]
+    eta = destination_etas([destination_station], values)[0]
+    if eta is None:
+        raise HTTPException(status_code=400, detail=f"No route found to the station of reservation {body.reservation_id}")
+
+    return OrjsonResponse(eta)
+
+
+@router.post("/calculate-eta-batch")
+async def calculate_eta_batch(
+    body: ETABatchRequest,
+    session: AsyncSession = Depends(get_session)
+):
+    ors_priority.set(BACKGROUND)
+
+    # A repeated reservation_id keeps its last current_location
+    current_locations = {item.reservation_id: item.current_location for item in body.reservations}
+
+    # All destination stations in one query
+    destinations = await get_destinations_by_reservation_ids(session, list(current_locations))
+
+    # All ETAs from as few ORS matrix calls as possible
+    found = [reservation_id for reservation_id in current_locations if reservation_id in destinations]
+    try:
+        with timed("eta_matrix"):
+            values = await get_travel_times([
+                (current_locations[reservation_id], destinations[reservation_id]["station_id"],
+                 destinations[reservation_id]["location"]) for reservation_id in found
+            ])
+    except RoutingServiceError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Unknown and unroutable reservations map to null, like a 404 or 400 from /calculate-eta
+    result = {reservation_id: None for reservation_id in current_locations}
+    result.update(zip(found, destination_etas([destinations[reservation_id] for reservation_id in found], values)))
+
+    return OrjsonResponse(result)
 
 
 @router.post("/get-route")
-def get_route(
+async def get_route(
     body: RouteRequest,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    destination_station = get_destination_by_station_id(session, body.station_id)
+    destination_station = await get_destination_by_station_id(session, body.station_id)
 
     if not destination_station:
         raise HTTPException(status_code=404, detail=f"Station not found for reservation with station_id {body.station_id}")
     
     try:
-        locations = get_route_locations(body.source, destination_station, body.interval)
+        with timed("route_sampling"):
+            locations = await get_route_locations(body.source, destination_station, body.interval)
+    except RoutingServiceError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return OrjsonResponse(locations)
+
+
+@router.post("/tracking-sessions")
+async def start_tracking_session(
+    body: TrackingSessionRequest,
+    session: AsyncSession = Depends(get_session)
+):
+    # Fetches the route to the reserved station once, position updates are then answered locally
+    destination_station = await get_destination_by_reservation_id(session, body.reservation_id)
+
+    if not destination_station:
+        raise HTTPException(status_code=404, detail=f"Station not found for reservation with reservation_id {body.reservation_id}")
+
+    try:
+        return await tracking_sessions.start(body.current_location, destination_station["location"])
+    except RoutingServiceError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/tracking-sessions/{session_id}/position")
+async def update_tracking_session(session_id: str, body: PositionUpdate):
+    # Re-routes are background work like ETA polling
+    ors_priority.set(BACKGROUND)
+    tracking_session = await tracking_sessions.get(session_id)
+
+    if not tracking_session:
+        raise HTTPException(status_code=404, detail=f"Tracking session {session_id} not found or expired")
+
+    try:
+        return await tracking_sessions.update(tracking_session, body.current_location)
     except RoutingServiceError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    return locations
+
+@router.delete("/tracking-sessions/{session_id}")
+async def end_tracking_session(session_id: str):
+    if not await tracking_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Tracking session {session_id} not found or expired")
+
+    return {"session_id": session_id}
+
+
+def coalescing_stats():
+    return {
+        "directions": route_flights.stats(),
+        "matrix": matrix_flights.stats(),
+        "station_lookup": station_lookups.stats()
+    }
+
+
+@router.get("/cache-stats")
+async def cache_stats():
+    return {
+        "route_cache": route_cache.stats(),
+        "matrix_cache": matrix_cache.stats(),
+        "tracking_sessions": tracking_sessions.stats(),
+        "charger_availability": charger_availability.stats(),
+        "ors_scheduler": scheduler.stats(),
+        "coalescing": coalescing_stats(),
+        "token_cache": token_cache.stats(),
+        "logging": log_pipeline.stats()
+    }
+
+
+# Same numbers as /cache-stats, as gauges on /metrics
+stats_collector.register("route_cache", route_cache.stats)
+stats_collector.register("matrix_cache", matrix_cache.stats)
+stats_collector.register("tracking_sessions", tracking_sessions.stats)
+stats_collector.register("charger_availability", charger_availability.stats)
+stats_collector.register("ors_scheduler", scheduler.stats, label="endpoint")
+stats_collector.register("coalescing", coalescing_stats, label="call")
+stats_collector.register("token_cache", token_cache.stats)
+stats_collector.register("logging", log_pipeline.stats)
@@ -0,0 +1,249 @@
+# Pre-fork production launcher, run from the processor directory:
+#   python -m app.server --workers 4 --port 8000
+# The master loads the read-only state (models, charging table, road graph, station catalog) once,
+# then forks the workers, which share it copy-on-write. Each worker opens its own DB and ORS pools.
+# SIGTERM/SIGINT drain and stop the workers, SIGHUP recycles them all, the master respawns any that exit.
+import argparse
+import asyncio
+import gc
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the processor API with pre-forked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("WEB_CONCURRENCY", len(os.sched_getaffinity(0)))))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--max-requests", type=int, default=0, help="Recycle a worker after this many requests")
+    parser.add_argument("--max-requests-jitter", type=int, default=0, help="Spreads recycling across workers")
+    parser.add_argument("--max-rss-mb", type=float, default=0, help="Recycle a worker above this resident size")
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="s for in-flight requests on shutdown")
+    parser.add_argument("--db-pool-size", type=int, help="Per worker, defaults to DB_POOL_SIZE")
+    parser.add_argument("--ors-connections", type=int, help="Per worker, defaults to ORS_MAX_CONNECTIONS")
+    return parser.parse_args()
+
+
+def configure(args):
+    # Before any app import, settings are read and metrics created at import time
+    # Returns the metrics directory when it was created here, to be removed on exit
+    created = None
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        created = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="processor_metrics_")
+    # Leftovers from a previous run would be summed into /metrics
+    for name in os.listdir(os.environ["PROMETHEUS_MULTIPROC_DIR"]):
+        os.remove(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], name))
+
+    from app.config import settings
+
+    if args.db_pool_size is not None:
+        settings.DB_POOL_SIZE = args.db_pool_size
+    if args.ors_connections is not None:
+        settings.ORS_MAX_CONNECTIONS = args.ors_connections
+
+    # ORS limits belong to the API key, every worker gets its share of the per-minute rate.
+    # The daily allowance is counted in memory shared by all workers (TokenBucket), it is not split.
+    for name in ("ORS_DIRECTIONS_PER_MINUTE", "ORS_MATRIX_PER_MINUTE"):
+        if getattr(settings, name) is not None:
+            setattr(settings, name, max(1, getattr(settings, name) // args.workers))
+
+    return created
+
+
+async def preload_tables():
+    from app.config import settings, logger
+    from app.dependencies.database import engine
+    from app.main import load_station_catalog, load_charger_availability
+
+    try:
+        if settings.STATION_LOOKUP_MODE == "memory":
+            await load_station_catalog()
+        if settings.AVAILABILITY_MODE != "off":
+            await load_charger_availability()
+    except Exception as e:
+        logger.warning("Preloading station data failed, the workers load it themselves: %s", e)
+    finally:
+        # No pooled connection may cross the fork
+        await engine.dispose()
+
+
+def preload():
+    from app.config import logger
+    from app.services.model_registry import registry
+
+    start = time.perf_counter()
+    import app.main  # noqa: F401, builds the app and registers every model
+    registry.warm_up()
+    asyncio.run(preload_tables())
+
+    # Objects loaded so far stay out of the collector, so it does not touch (and copy) their pages
+    gc.collect()
+    gc.freeze()
+    elapsed = time.perf_counter() - start
+    logger.info("Preloaded in %.1fs", elapsed, extra={"elapsed_s": round(elapsed, 1)})
+
+
+def bind(host, port, backlog):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock, args):
+    import uvicorn
+    from app.main import app
+
+    # Back to default handlers, uvicorn installs its own for graceful shutdown
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(sig, signal.SIG_DFL)
+    # Otherwise every worker draws the same retry jitter
+    random.seed()
+
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        access_log=False,  # log_requests writes one sampled record per request
+        limit_max_requests=args.max_requests or None,
+        limit_max_requests_jitter=args.max_requests_jitter,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return 0.0
+
+
+class Master:
+    def __init__(self, sock, args):
+        self.sock = sock
+        self.args = args
+        self.workers = {}  # pid: started at (monotonic)
+        self.recycling = set()  # Signalled to recycle and still draining, a second SIGTERM would skip the drain
+        self.stopping = False
+        self.stop_deadline = None
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.sock, self.args)
+            except BaseException:
+                code = 1
+            finally:
+                # Skip the master's atexit handlers and buffers, but write out this worker's queued log records
+                from app.config import log_pipeline
+                log_pipeline.stop()
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+
+    def signal_workers(self, sig):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def on_stop(self, signum, frame):
+        if not self.stopping:
+            self.stopping = True
+            self.stop_deadline = time.monotonic() + self.args.graceful_timeout + 5
+            self.signal_workers(signal.SIGTERM)
+
+    def on_recycle(self, signum, frame):
+        # Each worker drains its requests and exits, replacements are forked from the preloaded master
+        for pid in self.workers.keys() - self.recycling:
+            os.kill(pid, signal.SIGTERM)
+            self.recycling.add(pid)
+
+    def reap(self):
+        from app.config import logger
+        from prometheus_client import multiprocess
+
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            self.recycling.discard(pid)
+
+            multiprocess.mark_process_dead(pid)
+            if not self.stopping:
+                code = os.waitstatus_to_exitcode(status)
+                logger.info("Worker %d exited (%d), starting a new one", pid, code,
+                            extra={"worker_pid": pid, "exit_code": code})
+                if time.monotonic() - started < 1:
+                    time.sleep(1)  # Crashing on startup, do not spin
+                self.spawn()
+
+    def check_memory(self):
+        from app.config import logger
+
+        for pid in self.workers.keys() - self.recycling:
+            rss = rss_mb(pid)
+            if rss > self.args.max_rss_mb:
+                logger.info("Worker %d uses %.0f MB, recycling it", pid, rss,
+                            extra={"worker_pid": pid, "rss_mb": round(rss)})
+                os.kill(pid, signal.SIGTERM)
+                self.recycling.add(pid)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.on_stop)
+        signal.signal(signal.SIGINT, self.on_stop)
+        signal.signal(signal.SIGHUP, self.on_recycle)
+
+        for _ in range(self.args.workers):
+            self.spawn()
+
+        last_memory_check = time.monotonic()
+        while self.workers:
+            self.reap()
+            time.sleep(0.2)
+
+            if self.stopping and time.monotonic() > self.stop_deadline:
+                self.signal_workers(signal.SIGKILL)
+            elif self.args.max_rss_mb and time.monotonic() - last_memory_check > 5:
+                self.check_memory()
+                last_memory_check = time.monotonic()
+
+
+def main():
+    args = parse_args()
+    metrics_dir = configure(args)
+    preload()
+
+    from app.config import logger
+
+    sock = bind(args.host, args.port, args.backlog)
+    logger.info("Listening on %s:%d with %d workers", args.host, args.port, args.workers,
+                extra={"host": args.host, "port": args.port, "workers": args.workers})
+    Master(sock, args).run()
+
+    if metrics_dir is not None:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
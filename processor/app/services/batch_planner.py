@@ -0,0 +1,245 @@
+import asyncio
+import json
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings, logger
+from app.dependencies.database import engine
+from app.models.request_models import StationRequest
+from app.models.response_models import dumps
+from app.services.open_route import get_location_range, get_ranked_candidates, get_travel_times, \
+    travel_time_columns, RoutingServiceError, client, route_cache, matrix_cache, scheduler
+from app.services.charging_estimation import get_estimate_charging_times, get_reachable_range
+from app.services.database import get_stations_from_db
+from app.services.model_registry import registry
+from app.services.station_catalog import station_catalog
+from app.services.charger_availability import charger_availability
+from app.services.metrics import timed
+
+
+def read_trips(path, batch_size):
+    # Yields lists of (trip_id, row), rows shaped like the /get-filtered-stations body
+    if path.endswith(".parquet"):
+        yield from read_parquet_trips(path, batch_size)
+        return
+
+    with open(path) as f:
+        batch = []
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            batch.append((row.get("trip_id", line_number), row))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def read_parquet_trips(path, batch_size):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet input needs the pyarrow package, install processor[batch]")
+
+    offset = 0
+    for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        rows = record_batch.to_pylist()
+        yield [(row.get("trip_id", offset + i + 1), row) for i, row in enumerate(rows)]
+        offset += len(rows)
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self._file = open(path, "wb")
+
+    def write(self, results):
+        for result in results:
+            self._file.write(dumps(result) + b"\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    # One row group per chunk, stations kept as a JSON string column
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet output needs the pyarrow package, install processor[batch]")
+
+        self._pa = pa
+        self._schema = pa.schema([("trip_id", pa.string()), ("stations", pa.string()), ("error", pa.string())])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, results):
+        self._writer.write_table(self._pa.Table.from_pylist([
+            {
+                "trip_id": str(result["trip_id"]),
+                "stations": dumps(result["stations"]).decode() if "stations" in result else None,
+                "error": result.get("error")
+            } for result in results
+        ], schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class BatchPlanner:
+    """Station recommendations for many trips, same pipeline as /get-filtered-stations.
+
+    ORS calls go through the service's route cache, matrix cache and rate limits.
+    Corridor buffering and the charging model run on the process pool, the model
+    once per chunk and EV model rather than once per trip.
+    """
+
+    def __init__(self, executor, station_lookup, concurrency):
+        self.executor = executor
+        self.station_lookup = station_lookup
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.planned = 0
+        self.failed = 0
+
+    async def find_stations(self, body):
+        # Corridor, station lookup, ranking and ETAs for one trip
+        with timed("route_corridor"):
+            buffer_polygon = await get_location_range(body.current_location, body.destination, self.executor)
+
+        with timed("station_lookup"):
+            if self.station_lookup == "memory":
+                stations = station_catalog.query(buffer_polygon, body.cuisines, body.connector_type)
+            else:
+                stations = await get_stations_from_db(buffer_polygon, body.cuisines, body.connector_type)
+
+        with timed("candidate_ranking"):
+            stations = await get_ranked_candidates(body.current_location, body.destination, stations,
+                                                   get_reachable_range(body.current_soc, body.current_car_range),
+                                                   settings.STATION_CANDIDATE_TOP_K)
+
+        if not len(stations):
+            return stations
+
+        # No chunking, throughput not latency, as few matrix calls as the ORS limits allow
+        with timed("eta_matrix"):
+            values = await get_travel_times([
+                (body.current_location, station_id, location)
+                for station_id, location in zip(stations.station_id.tolist(), stations.locations())
+            ])
+
+        routable, columns = travel_time_columns(values)
+        return stations.with_columns(**columns).take(routable)
+
+    async def plan_trip(self, trip_id, row):
+        try:
+            body = StationRequest.model_validate(row)
+        except ValidationError as e:
+            fields = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            return None, {"trip_id": trip_id, "error": f"Invalid trip: {fields}"}
+
+        async with self._semaphore:
+            try:
+                return body, await self.find_stations(body)
+            except RoutingServiceError as e:
+                return None, {"trip_id": trip_id, "error": str(e)}
+
+    async def plan_chunk(self, trips):
+        planned = await asyncio.gather(*(self.plan_trip(trip_id, row) for trip_id, row in trips))
+        ok = [i for i, (body, _) in enumerate(planned) if body is not None]
+
+        # Charging times for the whole chunk in one job
+        with timed("charging_estimate"):
+            estimates = await self._run_cpu(get_estimate_charging_times, [
+                (body.ev_model, body.current_soc, body.current_car_range, body.desired_soc, stations)
+                for body, stations in (planned[i] for i in ok)
+            ])
+
+        results = [error for _, error in planned]
+        for i, stations in zip(ok, estimates):
+            stations = charger_availability.filter_stations(stations)
+            if len(stations):
+                stations = stations.take(np.argsort(stations.distance_km, kind="stable"))
+            results[i] = {"trip_id": trips[i][0], "stations": stations.results()}
+
+        self.planned += len(ok)
+        self.failed += len(trips) - len(ok)
+        return results
+
+    async def _run_cpu(self, fn, *args):
+        if self.executor is None:
+            return await asyncio.to_thread(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def stats(self):
+        return {
+            "planned": self.planned,
+            "failed": self.failed,
+            "route_cache": route_cache.stats(),
+            "matrix_cache": matrix_cache.stats(),
+            "charger_availability": charger_availability.stats(),
+            "ors_scheduler": scheduler.stats()
+        }
+
+
+def warm_up_worker():
+    # Runs once per pool process, the charging time table is memory-mapped and shared between them
+    registry.warm_up()
+
+
+async def run(args, executor):
+    async with AsyncSession(engine) as session:
+        if args.station_lookup == "memory":
+            await station_catalog.load(session)
+        # Reservations as of the start of the run, arrivals are checked against the time each chunk is planned
+        if settings.AVAILABILITY_MODE != "off":
+            await charger_availability.load(session)
+
+    planner = BatchPlanner(executor, args.station_lookup, args.concurrency)
+    writer = ParquetWriter(args.output) if args.output.endswith(".parquet") else JsonlWriter(args.output)
+    start = time.perf_counter()
+
+    try:
+        for trips in read_trips(args.input, args.chunk_size):
+            writer.write(await planner.plan_chunk(trips))
+            elapsed = time.perf_counter() - start
+            logger.info("Planned %d trips in %.1fs", planner.planned + planner.failed, elapsed,
+                        extra={"trips": planner.planned + planner.failed, "elapsed_s": round(elapsed, 1)})
+    finally:
+        writer.close()
+        await client.aclose()
+        await engine.dispose()
+
+    logger.info("Planned %d trips, %d failed", planner.planned, planner.failed, extra=planner.stats())
+
+
+if __name__ == "__main__":
+    # Offline run, from the processor directory:
+    #   python -m app.services.batch_planner trips.jsonl stations.jsonl
+    # Rate limits are per process, lower ORS_*_PER_MINUTE/DAY when the service shares the API key
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Station recommendations for a file of trips")
+    parser.add_argument("input", help="JSONL or .parquet, one /get-filtered-stations body per row, optional trip_id")
+    parser.add_argument("output", help="JSONL or .parquet, one result per trip in input order")
+    parser.add_argument("--workers", type=int, default=2, help="Processes for buffering and the model, 0 for threads")
+    parser.add_argument("--concurrency", type=int, default=20, help="Trips in flight at a time")
+    parser.add_argument("--chunk-size", type=int, default=200, help="Trips read, estimated and written together")
+    parser.add_argument("--station-lookup", choices=("memory", "db"), default="memory")
+    parser.add_argument("--queue-timeout", type=float, default=None,
+                        help="Longest wait for an ORS rate limit slot (s), waits as long as needed by default")
+    args = parser.parse_args()
+
+    scheduler.queue_timeout = args.queue_timeout
+
+    if args.workers:
+        # spawn, the parent already holds threads and connections that should not be forked
+        with ProcessPoolExecutor(args.workers, mp_context=get_context("spawn"), initializer=warm_up_worker) as pool:
+            asyncio.run(run(args, pool))
+    else:
+        asyncio.run(run(args, None))
@@ -0,0 +1,39 @@
+import numpy as np
+import shapely
+from app.services.corridor import project_route, route_transformers
+
+
+class ProjectedRoute:
+    """Route line in UTM meters, to measure how far along the route a station is."""
+
+    __slots__ = ("line", "forward")
+
+    def __init__(self, route_coords):
+        coords = np.asarray(route_coords, dtype=np.float64)[:, :2]
+        self.line, _ = project_route(coords)
+        self.forward, _ = route_transformers(coords)
+
+    def along_route_km(self, current_location, lon, lat):
+        # Distance along the route from the car to each station's projection, plus the way off the route
+        points = shapely.points(*self.forward.transform(lon, lat))
+        start = shapely.line_locate_point(self.line, shapely.points(*self.forward.transform(*current_location)))
+
+        along = np.abs(shapely.line_locate_point(self.line, points) - start)
+        return (along + shapely.distance(self.line, points)) / 1000
+
+
+def rank_candidates(projected, current_location, stations, max_distance_km, top_k):
+    """Stations (a StationBatch) reachable within max_distance_km along the route, nearest top_k first."""
+    if not len(stations):
+        return stations
+
+    estimates = projected.along_route_km(current_location, stations.lon, stations.lat)
+
+    # The driving distance from ORS is never much below the along-route estimate
+    order = np.argsort(estimates, kind="stable")
+    order = order[estimates[order] <= max_distance_km]
+
+    if top_k:
+        order = order[:top_k]
+
+    return stations.take(order)
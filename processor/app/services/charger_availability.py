@@ -0,0 +1,126 @@
+import asyncio
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from itertools import accumulate
+import numpy as np
+from app.config import settings, logger
+from app.models.response_models import AnnotatedCharger
+from app.services.database import get_reservation_rows
+
+
+class ChargerAvailability:
+    """In-process interval index of upcoming reservations, per charger.
+
+    Each charger keeps its reservations sorted by start with a running maximum
+    of the ends, so "is anything booked within [start, end)" is one bisect.
+    New reservations are merged in by created_at watermark, a full reload also
+    picks up shifted and cancelled ones.
+    """
+
+    def __init__(self, mode, margin):
+        self.mode = mode  # "annotate" flags booked chargers, "drop" removes them
+        self.margin = margin  # s, added before the arrival and after the end of charging
+        self._reservations = {}  # reservation_id: (charger_id, start, end), epoch s
+        self._index = {}  # charger_id: (starts, running max of ends), swapped as a whole
+        self._watermark = None
+        self._lock = asyncio.Lock()
+        self.loaded = False
+        self.chargers_checked = 0
+        self.chargers_booked = 0
+
+    async def load(self, session):
+        async with self._lock:
+            self._reservations, self._watermark = {}, None
+            self._merge(await get_reservation_rows(session, datetime.now(timezone.utc)))
+            self._rebuild()
+            self.loaded = True
+
+        logger.info("Charger availability loaded with %d upcoming reservations", len(self._reservations),
+                    extra={"reservations": len(self._reservations)})
+
+    async def refresh(self, session):
+        async with self._lock:
+            self._merge(await get_reservation_rows(session, datetime.now(timezone.utc), since=self._watermark))
+            self._rebuild()
+
+    def _merge(self, rows):
+        for row in rows:
+            self._reservations[row.reservation_id] = (
+                row.charger_id, row.reservation_start.timestamp(), row.reservation_end.timestamp()
+            )
+            self._watermark = max(row.created_at, self._watermark or row.created_at)
+
+    def _rebuild(self):
+        # Finished reservations are dropped here, the rest indexed per charger
+        now = time.time()
+        intervals = {}
+        for reservation_id, (charger_id, start, end) in list(self._reservations.items()):
+            if end <= now:
+                del self._reservations[reservation_id]
+            else:
+                intervals.setdefault(charger_id, []).append((start, end))
+
+        index = {}
+        for charger_id, rows in intervals.items():
+            rows.sort()
+            index[charger_id] = ([start for start, _ in rows], list(accumulate((end for _, end in rows), max)))
+        self._index = index
+
+    def is_free(self, charger_id, start, end):
+        entry = self._index.get(charger_id)
+        if entry is None:
+            return True
+
+        # Reservations starting before the window ends overlap it when any of them ends after it starts
+        starts, max_ends = entry
+        i = bisect_left(starts, end)
+        return i == 0 or max_ends[i - 1] <= start
+
+    def filter_stations(self, stations, now=None):
+        """Checks every charger against arrival (travel_time_min) to end of charging (estimate_charging_time_min).
+
+        Returns a new StationBatch: booked chargers dropped, or flagged with available in annotate mode.
+        """
+        if not self.loaded or not len(stations):
+            return stations
+
+        now = time.time() if now is None else now
+        starts = (now + stations.travel_time_min * 60 - self.margin).tolist()
+        ends = (now + (stations.travel_time_min + stations.estimate_charging_time_min) * 60 + self.margin).tolist()
+
+        chargers = []
+        for station_chargers, start, end in zip(stations.chargers, starts, ends):
+            free = [self.is_free(c.charger_id, start, end) for c in station_chargers]
+            self.chargers_checked += len(free)
+            self.chargers_booked += free.count(False)
+
+            if self.mode == "drop":
+                chargers.append([c for c, is_free in zip(station_chargers, free) if is_free])
+            else:
+                chargers.append([
+                    AnnotatedCharger(c.charger_id, c.type, c.max_power, is_free)
+                    for c, is_free in zip(station_chargers, free)
+                ])
+
+        if self.mode == "drop":
+            keep = np.fromiter((len(c) > 0 for c in chargers), dtype=bool, count=len(chargers))
+            return stations.with_columns(chargers=chargers).take(keep)
+
+        available = np.fromiter((any(c.available for c in row) for row in chargers), dtype=bool, count=len(chargers))
+        return stations.with_columns(chargers=chargers, available=available)
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "reservations": len(self._reservations),
+            "chargers": len(self._index),
+            "chargers_checked": self.chargers_checked,
+            "chargers_booked": self.chargers_booked
+        }
+
+
+charger_availability = ChargerAvailability(
+    mode=settings.AVAILABILITY_MODE,
+    margin=settings.AVAILABILITY_MARGIN,
+)
@@ -1,49 +1,109 @@
-import pandas as pd
+import numpy as np
 import warnings
-import joblib
-from app.constants import MINIMUM_SOC_AT_ARRIVAL, TEMPERATURE
+from app.constants import MINIMUM_SOC_AT_ARRIVAL, TEMPERATURE, CHARGING_TIME_MODEL_PATH
+from app.services.charging_predictor import ChargingTimePredictor
+from app.services.charging_table import load_charging_time_table
+from app.services.model_registry import registry
+from app.services.metrics import timed, PREDICT_SECONDS, PREDICT_BATCH_SIZE
 
 
 warnings.filterwarnings("ignore", message="X does not have valid feature names")
 
-model = joblib.load("app/trained_models/sample_time_predictor_LGBM_compressed.pkl")
 
+def load_charging_time_model():
+    import joblib  # Deferred, unpickling pulls in sklearn and lightgbm
 
-def get_estimate_charging_time(ev_model, current_soc, current_car_range, desired_soc, stations):
-    available_stations = []
+    return joblib.load(CHARGING_TIME_MODEL_PATH)
 
-    # Filter out stations that are too far
+
+# Only loaded on first use, with a lookup table in place that is a request outside the grid
+registry.register("charging_time_model", load_charging_time_model, warm_up=False)
+registry.register("charging_time_predictor", lambda: ChargingTimePredictor(registry.get("charging_time_model")),
+                  warm_up=False)
+
+
+def load_charging_time_estimator():
+    # Table lookup when a table for the current model was built, the model answers the rest
+    table = load_charging_time_table(fallback=lambda: registry.get("charging_time_predictor"))
+    return table if table is not None else registry.get("charging_time_predictor")
+
+
+registry.register("charging_time_estimator", load_charging_time_estimator)
+
+
+def get_reachable_range(current_soc, current_car_range):
+    # Furthest distance (km) that still arrives with MINIMUM_SOC_AT_ARRIVAL, same rate and rounding as below
+    return max(current_soc - MINIMUM_SOC_AT_ARRIVAL + 0.5, 0) * current_car_range / current_soc
+
+
+def reachable_stations(current_soc, current_car_range, stations):
+    # Stations reached with at least MINIMUM_SOC_AT_ARRIVAL, their SoC at arrival and charger power (W)
     # Calculate SoC decrease rate
     soc_rate = current_soc / current_car_range  # % decrease by 1 km
 
-    for st in stations:
-        st.pop("location", None)  # Remove location as we no longer need it
-        # Calculate SoC at arrival
-        soc_at_arrival = round(current_soc - soc_rate * st["distance_km"])
+    # Calculate SoC at arrival for all stations at once
+    soc_at_arrival = np.round(current_soc - soc_rate * stations.distance_km)
+
+    # Drop stations where soc_at_arrival is less than MINIMUM_SOC_AT_ARRIVAL
+    reachable = np.flatnonzero(soc_at_arrival >= MINIMUM_SOC_AT_ARRIVAL)
 
-        # If soc_at_arrival is less than minimum, continue MINIMUM_SOC_AT_ARRIVAL
-        if soc_at_arrival < MINIMUM_SOC_AT_ARRIVAL:
-            continue
+    available_stations = stations.take(reachable)
+    return available_stations, soc_at_arrival[reachable], available_stations.max_power * 1000
 
-        st["soc_at_arrival"] = soc_at_arrival
-        available_stations.append(st)
+
+def add_charging_times(stations, min_soc, predicted_sample_time):
+    return stations.with_columns(
+        soc_at_arrival=min_soc.astype(np.int64),
+        estimate_charging_time_min=np.round(predicted_sample_time / 60).astype(np.int64)
+    )
+
+
+def get_estimate_charging_time(ev_model, current_soc, current_car_range, desired_soc, stations):
+    if not len(stations):
+        return stations
+
+    # Filter out stations that are too far
+    available_stations, min_soc, max_power = reachable_stations(current_soc, current_car_range, stations)
 
     if not len(available_stations):
-        return []
+        return available_stations
+
+    predictor = registry.get("charging_time_estimator")
+    PREDICT_BATCH_SIZE.observe(len(available_stations))
+    with timed("model_predict", PREDICT_SECONDS):
+        predicted_sample_time = predictor.predict(ev_model, min_soc, desired_soc - min_soc, max_power, TEMPERATURE)
+
+    return add_charging_times(available_stations, min_soc, predicted_sample_time)
+
+
+def get_estimate_charging_times(trips):
+    """get_estimate_charging_time for many trips, one predict call per EV model.
+
+    trips: [(ev_model, current_soc, current_car_range, desired_soc, stations)]
+    """
+    # Trips without reachable stations keep an empty batch
+    results = [stations for *_, stations in trips]
+    by_model = {}
 
-    test_data = [{
-        "EVModel": ev_model,
-        "min_soc": st["soc_at_arrival"],
-        "soc_diff": desired_soc - st["soc_at_arrival"],
-        "max_power": st["chargers"][0]["max_power"] * 1000,
-        "mean_temp": TEMPERATURE
-    } for st in available_stations]
+    for i, (ev_model, current_soc, current_car_range, desired_soc, stations) in enumerate(trips):
+        if len(stations):
+            available_stations, min_soc, max_power = reachable_stations(current_soc, current_car_range, stations)
+            results[i] = available_stations
+            if len(available_stations):
+                by_model.setdefault(ev_model, []).append((i, available_stations, min_soc, desired_soc - min_soc,
+                                                          max_power))
 
-    test_data_frame = pd.DataFrame(test_data)
-    predicted_sample_time = model.predict(test_data_frame)
-    predictions = pd.Series(predicted_sample_time)
+    predictor = registry.get("charging_time_estimator")
+    for ev_model, rows in by_model.items():
+        min_soc = np.concatenate([row[2] for row in rows])
+        PREDICT_BATCH_SIZE.observe(len(min_soc))
+        with timed("model_predict", PREDICT_SECONDS):
+            predicted_sample_time = predictor.predict(ev_model, min_soc, np.concatenate([row[3] for row in rows]),
+                                                      np.concatenate([row[4] for row in rows]), TEMPERATURE)
 
-    for station, pred in zip(available_stations, predictions.tolist()):
-        station["estimate_charging_time_min"] = round(pred / 60)
+        # Split the predictions back per trip
+        offsets = np.cumsum([len(row[2]) for row in rows])[:-1]
+        for (i, available_stations, trip_min_soc, _, _), predicted in zip(rows, np.split(predicted_sample_time, offsets)):
+            results[i] = add_charging_times(available_stations, trip_min_soc, predicted)
 
-    return available_stations
+    return results
@@ -0,0 +1,57 @@
+import threading
+import numpy as np
+
+
+class ChargingTimePredictor:
+    """Batch charging-time predictor working directly on NumPy arrays.
+
+    Unpacks the trained sklearn pipeline (one-hot EVModel + StandardScaler +
+    LGBMRegressor) once, so a request only fills a feature matrix and calls the
+    native LightGBM booster. No pandas DataFrame is built on the request path.
+    """
+
+    NUMERIC_FEATURES = ("min_soc", "soc_diff", "max_power", "mean_temp")
+
+    def __init__(self, pipeline):
+        preprocessor = pipeline.named_steps["preprocessor"]
+        one_hot = preprocessor.named_transformers_["cat"]
+        scaler = preprocessor.named_transformers_["num"]
+
+        # Pre-encoded EVModel categories, unknown models get an all-zero one-hot like handle_unknown="ignore"
+        self.categories = {name: i for i, name in enumerate(one_hot.categories_[0])}
+        self.n_categories = len(self.categories)
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        self.n_features = self.n_categories + len(self.NUMERIC_FEATURES)
+
+        self.booster = pipeline.named_steps["model"].booster_
+        self._local = threading.local()
+
+    def _features(self, n):
+        # Per-thread buffer, reused between calls and grown when a batch is larger
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape[0] < n:
+            buffer = np.empty((max(n, 64), self.n_features), dtype=np.float64)
+            self._local.buffer = buffer
+
+        return buffer[:n]
+
+    def predict(self, ev_model, min_soc, soc_diff, max_power, mean_temp):
+        """Predicted charging time in seconds, one value per row."""
+        n = len(min_soc)
+        features = self._features(n)
+
+        features[:, :self.n_categories] = 0
+        category = self.categories.get(ev_model)
+        if category is not None:
+            features[:, category] = 1
+
+        numeric = features[:, self.n_categories:]
+        numeric[:, 0] = min_soc
+        numeric[:, 1] = soc_diff
+        numeric[:, 2] = max_power
+        numeric[:, 3] = mean_temp
+        numeric -= self.mean
+        numeric /= self.scale
+
+        return self.booster.predict(features)
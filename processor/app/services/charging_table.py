@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+from app.constants import TEMPERATURE, CHARGING_TIME_MODEL_PATH, CHARGING_TIME_TABLE_PATH
+
+# The app logger, set up by app.config. Not imported from there: the image build runs this module's
+# table builder without DATABASE_URL and the other runtime settings.
+logger = logging.getLogger("app_logger")
+
+# Charger ratings in the stations data (kW)
+CHARGER_POWERS_KW = (22, 50, 80, 100, 150, 160, 180, 200, 300, 400)
+SOC_STEP = 1  # % between grid points on both SoC axes, integer SoC pairs are looked up exactly
+
+
+def model_digest(path=CHARGING_TIME_MODEL_PATH):
+    # Ties a table to the model it was built from
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def meta_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def build_charging_table(predictor, powers_kw=CHARGER_POWERS_KW, soc_step=SOC_STEP, temperature=TEMPERATURE):
+    """Evaluate the model over (EV model, power, min_soc, soc_diff), float32 seconds."""
+    ev_models = sorted(predictor.categories, key=predictor.categories.get)
+    min_soc = np.arange(0, 100 + soc_step, soc_step, dtype=np.float64)
+    soc_diff = np.arange(0, 100 + soc_step, soc_step, dtype=np.float64)
+
+    # One batch per EV model, all powers and SoC pairs at once
+    power_grid, min_grid, diff_grid = (g.ravel() for g in np.meshgrid(
+        np.asarray(powers_kw, dtype=np.float64) * 1000, min_soc, soc_diff, indexing="ij"))
+
+    # The last row is an unknown EV model, which the predictor encodes as an all-zero one-hot
+    table = np.empty((len(ev_models) + 1, len(powers_kw), len(min_soc), len(soc_diff)), dtype=np.float32)
+    for i, ev_model in enumerate(ev_models + [None]):
+        table[i] = predictor.predict(ev_model, min_grid, diff_grid, power_grid, temperature).reshape(table.shape[1:])
+
+    meta = {
+        "ev_models": ev_models,
+        "powers_w": [p * 1000 for p in powers_kw],
+        "soc_step": soc_step,
+        "axis_max": 100,
+        "temperature": temperature,
+    }
+    return table, meta
+
+
+def save_charging_table(table, meta, path=CHARGING_TIME_TABLE_PATH):
+    np.save(path, table)
+    with open(meta_path(path), "w") as f:
+        json.dump({**meta, "model_sha256": model_digest()}, f)
+
+
+class ChargingTimeTable:
+    """Charging-time lookup over the precomputed grid, bilinear in the two SoC axes.
+
+    With the default 1% step, integer SoC pairs are grid points and give the model's
+    minutes exactly. A fractional desired SoC is interpolated: in benchmarks.charging_table
+    78% of those match and the worst is 7 minutes off.
+
+    The array is memory-mapped read-only, so worker processes share the pages.
+    Rows outside the grid (other powers or temperature, negative soc_diff) go to
+    the fallback predictor, which is only loaded when first needed.
+    """
+
+    def __init__(self, path, fallback):
+        with open(meta_path(path)) as f:
+            meta = json.load(f)
+
+        self.table = np.load(path, mmap_mode="r")
+        self.models = {name: i for i, name in enumerate(meta["ev_models"])}
+        self.unknown_model = len(meta["ev_models"])
+        self.powers = np.asarray(meta["powers_w"], dtype=np.float64)
+        self.step = float(meta["soc_step"])
+        self.axis_max = float(meta["axis_max"])
+        self.temperature = meta["temperature"]
+        self.model_sha256 = meta["model_sha256"]
+        self.fallback = fallback
+        self.lookups = 0
+        self.fallbacks = 0
+
+    def predict(self, ev_model, min_soc, soc_diff, max_power, mean_temp):
+        """Charging time in seconds, same inputs and output as ChargingTimePredictor.predict."""
+        min_soc = np.asarray(min_soc, dtype=np.float64)
+        soc_diff = np.broadcast_to(np.asarray(soc_diff, dtype=np.float64), min_soc.shape)
+        max_power = np.broadcast_to(np.asarray(max_power, dtype=np.float64), min_soc.shape)
+
+        power_idx = np.searchsorted(self.powers, max_power).clip(0, len(self.powers) - 1)
+        inside = (
+            (self.powers[power_idx] == max_power)
+            & (min_soc >= 0) & (min_soc <= self.axis_max)
+            & (soc_diff >= 0) & (soc_diff <= self.axis_max)
+            & (mean_temp == self.temperature)
+        )
+
+        result = np.empty(min_soc.shape, dtype=np.float64)
+        if inside.any():
+            result[inside] = self._interpolate(self.models.get(ev_model, self.unknown_model), power_idx[inside],
+                                               min_soc[inside], soc_diff[inside])
+        if not inside.all():
+            outside = ~inside
+            result[outside] = self.fallback().predict(ev_model, min_soc[outside], soc_diff[outside],
+                                                      max_power[outside], mean_temp)
+
+        self.lookups += int(inside.sum())
+        self.fallbacks += int((~inside).sum())
+        return result
+
+    def _interpolate(self, model_idx, power_idx, min_soc, soc_diff):
+        grid = self.table[model_idx]
+        last = grid.shape[1] - 1
+
+        x, y = min_soc / self.step, soc_diff / self.step
+        x0 = np.minimum(np.floor(x).astype(np.intp), last - 1)
+        y0 = np.minimum(np.floor(y).astype(np.intp), last - 1)
+        fx, fy = x - x0, y - y0
+
+        return (
+            grid[power_idx, x0, y0] * (1 - fx) * (1 - fy)
+            + grid[power_idx, x0 + 1, y0] * fx * (1 - fy)
+            + grid[power_idx, x0, y0 + 1] * (1 - fx) * fy
+            + grid[power_idx, x0 + 1, y0 + 1] * fx * fy
+        )
+
+    def stats(self):
+        return {"lookups": self.lookups, "fallbacks": self.fallbacks}
+
+
+def load_charging_time_table(fallback):
+    # None when the table is missing or was built from another model, the caller then uses the model
+    if not (os.path.exists(CHARGING_TIME_TABLE_PATH) and os.path.exists(meta_path(CHARGING_TIME_TABLE_PATH))):
+        logger.info("No charging time table at %s, using the model", CHARGING_TIME_TABLE_PATH,
+                    extra={"table_path": CHARGING_TIME_TABLE_PATH})
+        return None
+
+    table = ChargingTimeTable(CHARGING_TIME_TABLE_PATH, fallback)
+    if table.model_sha256 != model_digest():
+        logger.warning("Charging time table was built from a different model, rebuild it, using the model")
+        return None
+
+    return table
+
+
+if __name__ == "__main__":
+    # Offline build, run from the processor directory: python -m app.services.charging_table
+    import argparse
+    import time
+    import joblib
+    from app.services.charging_predictor import ChargingTimePredictor
+
+    parser = argparse.ArgumentParser(description="Precompute the charging time lookup table")
+    parser.add_argument("--soc-step", type=int, default=SOC_STEP)
+    parser.add_argument("--output", default=CHARGING_TIME_TABLE_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table, meta = build_charging_table(ChargingTimePredictor(joblib.load(CHARGING_TIME_MODEL_PATH)),
+                                       soc_step=args.soc_step)
+    save_charging_table(table, meta, args.output)
+    print(f"Wrote {args.output} {table.shape} ({table.nbytes / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
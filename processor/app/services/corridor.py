@@ -0,0 +1,47 @@
+from functools import lru_cache
+import numpy as np
+import shapely
+from pyproj import Transformer
+from app.constants import BUFFERED_ZONE, ROUTE_SIMPLIFY_TOLERANCE
+
+
+def utm_epsg(lon, lat):
+    # WGS 84 / UTM zone containing the point, Finland is mostly zones 34-36 north
+    zone = int((lon + 180) // 6) % 60 + 1
+    return (32600 if lat >= 0 else 32700) + zone
+
+
+@lru_cache(maxsize=16)
+def get_transformers(epsg):
+    # Building a Transformer is the expensive part of pyproj, reuse them per zone
+    forward = Transformer.from_crs("EPSG:4326", f"EPSG:{epsg}", always_xy=True)
+    backward = Transformer.from_crs(f"EPSG:{epsg}", "EPSG:4326", always_xy=True)
+    return forward, backward
+
+
+def route_transformers(coords):
+    # Transformers for the UTM zone of the route bounding box midpoint
+    (min_lon, min_lat), (max_lon, max_lat) = coords.min(axis=0), coords.max(axis=0)
+    return get_transformers(utm_epsg((min_lon + max_lon) / 2, (min_lat + max_lat) / 2))
+
+
+def project_route(route_coords):
+    # Project (lon, lat) coordinates to the UTM zone of the route midpoint, in meters
+    coords = np.asarray(route_coords, dtype=np.float64)[:, :2]
+    forward, backward = route_transformers(coords)
+
+    x, y = forward.transform(coords[:, 0], coords[:, 1])
+    return shapely.linestrings(x, y), backward
+
+
+def buffer_corridor(route_coords, width=BUFFERED_ZONE, tolerance=ROUTE_SIMPLIFY_TOLERANCE):
+    """Polygon (lon, lat) covering `width` meters on each side of the route."""
+    line, backward = project_route(route_coords)
+
+    # Douglas-Peucker first, the buffer then has a few hundred vertices instead of tens of thousands
+    line = shapely.simplify(line, tolerance, preserve_topology=False)
+    # The simplified line strays up to `tolerance` from the route, widen the buffer to still cover `width`
+    polygon = shapely.buffer(line, width + tolerance, quad_segs=4)
+
+    # Back to lon/lat for PostGIS
+    return shapely.transform(polygon, lambda xy: np.column_stack(backward.transform(xy[:, 0], xy[:, 1])))
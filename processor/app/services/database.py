@@ -1,23 +1,85 @@
-from app.models.database_models import Station, Charger, Reservation
-from sqlalchemy import select, join
-from sqlalchemy.orm import selectinload
-from sqlmodel import select
-from geoalchemy2 import functions as func
-from geoalchemy2.shape import to_shape
+from app.models.database_models import Station, Restaurant, Charger, Reservation
+from app.models.response_models import RestaurantResult, ChargerResult
+from app.models.station_batch import StationBatch
+from sqlalchemy import select, join, exists, func, cast, String
+from sqlalchemy.dialects.postgresql import ARRAY, JSON, array
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dependencies.database import engine
+from app.services.single_flight import SingleFlight
+from app.services.metrics import timed, DB_QUERY_SECONDS
 
 
-def get_stations_from_db(session, buffer_geojson, cuisines, connector_type):
-    polygon = buffer_geojson.geometry.unary_union
+# Shared by identical corridor lookups in flight at the same time
+station_lookups = SingleFlight()
+
+
+async def execute(session, stmt, query):
+    with timed(f"db_{query}", DB_QUERY_SECONDS, query=query):
+        return await session.execute(stmt)
+
+
+async def get_stations_from_db(polygon, cuisines, connector_type):
+    # The batch is never changed by the later stages, so coalesced callers share it
+    key = (polygon.wkb, tuple(sorted(cuisines)), connector_type)
+    return await station_lookups.run(key, lookup_stations, polygon, cuisines, connector_type)
+
+
+async def lookup_stations(polygon, cuisines, connector_type):
+    # On its own session: the shared call outlives a caller that disconnects, and that caller's session with it
+    async with AsyncSession(engine) as session:
+        return await query_stations_from_db(session, polygon, cuisines, connector_type)
+
+
+async def query_stations_from_db(session, polygon, cuisines, connector_type):
     buffer_wkt = polygon.wkt
 
     # Pre-filter by bounding box to make the query faster
     minx, miny, maxx, maxy = polygon.bounds
 
+    # Restaurants serving any of the cuisines (GIN index on cuisines)
+    restaurant_match = (
+        (Restaurant.station_id == Station.station_id)
+        & Restaurant.cuisines.op("&&")(cast(array(cuisines, type_=String), ARRAY(String(50))))
+    )
+    # Chargers with the requested connector (btree index on station_id, connector_type)
+    charger_match = (
+        (Charger.station_id == Station.station_id)
+        & (Charger.connector_type == connector_type)
+    )
+
+    restaurants = (
+        select(func.json_agg(func.json_build_object(
+            "restaurant_id", Restaurant.restaurant_id,
+            "station_id", Restaurant.station_id,
+            "name", Restaurant.name,
+            "address", Restaurant.address,
+            "cuisines", Restaurant.cuisines
+        ), type_=JSON))
+        .where(restaurant_match)
+        .scalar_subquery()
+    )
+    chargers = (
+        select(func.json_agg(func.json_build_object(
+            "charger_id", Charger.charger_id,
+            "type", Charger.connector_type,
+            "max_power", Charger.power
+        ), type_=JSON))
+        .where(charger_match)
+        .scalar_subquery()
+    )
+
     stmt = (
-        select(Station)
-        .options(
-            selectinload(Station.restaurants),
-            selectinload(Station.chargers)
+        select(
+            Station.station_id,
+            Station.name,
+            Station.address,
+            func.ST_X(func.geometry(Station.location)).label("lon"),
+            func.ST_Y(func.geometry(Station.location)).label("lat"),
+            restaurants.label("restaurants"),
+            chargers.label("chargers")
+        )
+        .where(
+            func.ST_MakeEnvelope(minx, miny, maxx, maxy, 4326).op("&&")(Station.location)
         )
         .where(
             func.ST_Intersects(
@@ -25,57 +87,93 @@ def get_stations_from_db(session, buffer_geojson, cuisines, connector_type):
                 func.ST_GeogFromText(buffer_wkt)
             )
         )
-        .where(
-            func.ST_MakeEnvelope(minx, miny, maxx, maxy, 4326).op("&&")(Station.location)
+        .where(exists().where(restaurant_match))
+        .where(exists().where(charger_match))
+    )
+
+    rows = (await execute(session, stmt, "stations")).all()
+
+    return StationBatch.from_rows(
+        [row.station_id for row in rows],
+        [row.lon for row in rows],
+        [row.lat for row in rows],
+        [row.name for row in rows],
+        [row.address for row in rows],
+        [[RestaurantResult(**r) for r in row.restaurants] for row in rows],
+        [[ChargerResult(**c) for c in row.chargers] for row in rows]
+    )
+
+
+async def get_station_catalog_rows(session, since=None):
+    # Rows for the in-memory station catalog, since = {"stations": ts, "restaurants": ts, "chargers": ts}
+    since = since or {}
+
+    stations_stmt = select(
+        Station.station_id,
+        Station.name,
+        Station.address,
+        func.ST_X(func.geometry(Station.location)).label("lon"),
+        func.ST_Y(func.geometry(Station.location)).label("lat"),
+        Station.created_at
+    )
+    restaurants_stmt = select(
+        Restaurant.restaurant_id,
+        Restaurant.station_id,
+        Restaurant.name,
+        Restaurant.address,
+        Restaurant.cuisines,
+        Restaurant.created_at
+    )
+    chargers_stmt = select(
+        Charger.charger_id,
+        Charger.station_id,
+        Charger.connector_type,
+        Charger.power,
+        Charger.created_at
+    )
+
+    # >= so rows sharing the watermark timestamp are not missed, merging by id makes repeats harmless
+    if since.get("stations"):
+        stations_stmt = stations_stmt.where(Station.created_at >= since["stations"])
+    if since.get("restaurants"):
+        restaurants_stmt = restaurants_stmt.where(Restaurant.created_at >= since["restaurants"])
+    if since.get("chargers"):
+        chargers_stmt = chargers_stmt.where(Charger.created_at >= since["chargers"])
+
+    return (
+        (await execute(session, stations_stmt, "catalog_stations")).all(),
+        (await execute(session, restaurants_stmt, "catalog_restaurants")).all(),
+        (await execute(session, chargers_stmt, "catalog_chargers")).all()
+    )
+
+
+async def get_reservation_rows(session, ends_after, since=None):
+    # Reservations not finished by ends_after, for the charger availability index
+    stmt = (
+        select(
+            Reservation.reservation_id,
+            Reservation.charger_id,
+            Reservation.reservation_start,
+            Reservation.reservation_end,
+            Reservation.created_at
         )
+        .where(Reservation.reservation_end > ends_after)
     )
 
-    stations = session.exec(stmt).all()
-
-    # Post-filter restaurants and chargers for each station in python memory
-    filtered_stations = []
-    for st in stations:
-        filtered_restaurants = [
-            {
-                "restaurant_id": r.restaurant_id,
-                "station_id": r.station_id,
-                "name": r.name,
-                "address": r.address,
-                "cuisines": r.cuisines
-            } for r in st.restaurants
-            if any(cuisine in cuisines for cuisine in r.cuisines)
-        ]
-
-        if len(filtered_restaurants) == 0:
-            continue
-
-        filtered_chargers = [
-            {
-                "charger_id": c.charger_id,
-                "type": c.connector_type,
-                "max_power": c.power
-            } for c in st.chargers
-            if c.connector_type == connector_type
-        ]
-
-        if len(filtered_chargers) == 0:
-            continue
-
-        filtered_stations.append({
-            "station_id": st.station_id,
-            "name": st.name,
-            "address": st.address,
-            "location": (to_shape(st.location).x, to_shape(st.location).y),
-            "restaurants": filtered_restaurants,
-            "chargers": filtered_chargers
-        })
-
-    return filtered_stations
-
-
-def get_destination_by_reservation_id(session, reservation_id):
+    # >= like the catalog, merging by id makes repeats harmless
+    if since:
+        stmt = stmt.where(Reservation.created_at >= since)
+
+    return (await execute(session, stmt, "availability_reservations")).all()
+
+
+async def get_destination_by_reservation_id(session, reservation_id):
     stmt = (
-        select(Station.location)
+        select(
+            Station.station_id,
+            func.ST_X(func.geometry(Station.location)).label("lon"),
+            func.ST_Y(func.geometry(Station.location)).label("lat")
+        )
         .select_from(
             join(Reservation, Charger, Reservation.charger_id == Charger.charger_id)
             .join(Station, Charger.station_id == Station.station_id)
@@ -83,23 +181,56 @@ def get_destination_by_reservation_id(session, reservation_id):
         .where(Reservation.reservation_id == reservation_id)
     )
 
-    location = session.execute(stmt).scalar_one()
+    row = (await execute(session, stmt, "destination_by_reservation")).one_or_none()
 
-    if not location:
+    if not row:
         return None
 
-    return to_shape(location).x, to_shape(location).y
+    # station_id keys the ETA cache
+    return {
+        "station_id": row.station_id,
+        "location": (row.lon, row.lat)
+    }
 
 
-def get_destination_by_station_id(session, station_id):
+async def get_destinations_by_reservation_ids(session, reservation_ids):
+    # Same lookup as get_destination_by_reservation_id, for many reservations in one query
     stmt = (
-        select(Station.location)
+        select(
+            Reservation.reservation_id,
+            Station.station_id,
+            func.ST_X(func.geometry(Station.location)).label("lon"),
+            func.ST_Y(func.geometry(Station.location)).label("lat")
+        )
+        .select_from(
+            join(Reservation, Charger, Reservation.charger_id == Charger.charger_id)
+            .join(Station, Charger.station_id == Station.station_id)
+        )
+        .where(Reservation.reservation_id.in_(reservation_ids))
+    )
+
+    rows = (await execute(session, stmt, "destinations_by_reservations")).all()
+
+    return {
+        row.reservation_id: {
+            "station_id": row.station_id,
+            "location": (row.lon, row.lat)
+        } for row in rows
+    }
+
+
+async def get_destination_by_station_id(session, station_id):
+    stmt = (
+        select(
+            func.ST_X(func.geometry(Station.location)).label("lon"),
+            func.ST_Y(func.geometry(Station.location)).label("lat")
+        )
         .where(Station.station_id == station_id)
     )
 
-    location = session.execute(stmt).scalar_one()
-    
-    if not location:
+    row = (await execute(session, stmt, "destination_by_station")).one_or_none()
+
+    if not row:
         return None
 
-    return to_shape(location).x, to_shape(location).y
+    return row.lon, row.lat
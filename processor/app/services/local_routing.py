@@ -0,0 +1,374 @@
+import asyncio
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra, connected_components
+from scipy.spatial import cKDTree
+from app.services.ors_client import OrsApiError
+from app.services.route_sampling import haversine_km, EARTH_RADIUS_KM
+from app.services.metrics import timed, ORS_REQUEST_SECONDS
+
+# Default speeds (km/h) per OSM highway type when a way has no usable maxspeed
+SPEED_KMH = {
+    "motorway": 110, "motorway_link": 60,
+    "trunk": 90, "trunk_link": 50,
+    "primary": 80, "primary_link": 50,
+    "secondary": 70, "secondary_link": 40,
+    "tertiary": 60, "tertiary_link": 40,
+    "unclassified": 50, "residential": 40, "living_street": 10, "service": 20,
+}
+STEP_EDGES = 10  # Graph edges per directions step, expand_route spreads a step's duration evenly
+SEARCH_DETOUR = 2.0  # Road km per straight-line km the first search region allows, checked after the search
+SEARCH_MARGIN_KM = 5.0  # Added to the first region, short trips detour more
+KM_PER_DEGREE = np.radians(1.0) * EARTH_RADIUS_KM
+
+
+class PathTree:
+    """Shortest-time tree of one search, over the nodes of its region (local indices)."""
+
+    __slots__ = ("nodes", "times", "predecessors", "targets")
+
+    def __init__(self, nodes, times, predecessors, targets):
+        self.nodes = nodes  # Graph node of each local index, sorted
+        self.times = times
+        self.predecessors = predecessors
+        self.targets = targets
+
+    def target_times(self):
+        return self.times[self.targets]
+
+    def path(self, i):
+        # Graph nodes from the source to the i-th target
+        nodes = [self.targets[i]]
+        while self.predecessors[nodes[-1]] >= 0:
+            nodes.append(self.predecessors[nodes[-1]])
+        return self.nodes[nodes[::-1]]
+
+
+class RoadGraph:
+    """Directed road graph in CSR arrays, edge weights in seconds with lengths in meters alongside.
+
+    Built offline from an OSM extract (build_road_graph), loaded once per process.
+    Shortest paths use scipy's compiled Dijkstra on the subgraph around the endpoints
+    a faster path could pass through, a query never touches arrays the size of the graph.
+    """
+
+    def __init__(self, indptr, indices, time_s, length_m, lon, lat):
+        n = len(lon)
+        self.indptr = indptr
+        self.indices = indices
+        self.time_s = time_s
+        self.length_m = length_m
+        self.lon = lon
+        self.lat = lat
+
+        # Sorted (from, to) keys of the edges, finds an edge's index without a Python loop
+        self.edge_keys = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr)) * n + indices
+
+        # No path of time t gets further than t at this speed from its ends (small margin for float32 weights)
+        self.max_speed_kmh = float(np.max(length_m / time_s)) * 3.6 * 1.001 if len(time_s) else 1.0
+
+        # Nearest node lookup on an equirectangular projection, fine at the scale of a snap
+        self._lon_scale = np.cos(np.radians(np.mean(lat))) if n else 1.0
+        self._tree = cKDTree(np.column_stack((lon * self._lon_scale, lat)))
+        # Radius factor that keeps a projected ball around everything within its radius in km, at every latitude
+        self._ball_scale = max(1.0, self._lon_scale / np.cos(np.radians(np.abs(lat).max()))) * 1.01 if n else 1.0
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["indptr"], data["indices"], data["time_s"], data["length_m"], data["lon"], data["lat"])
+
+    def snap(self, locations, max_distance_m):
+        # Nearest graph node of each (lon, lat), OrsApiError like ORS when none is close enough
+        locations = np.asarray(locations, dtype=np.float64)[:, :2]
+        _, nodes = self._tree.query(np.column_stack((locations[:, 0] * self._lon_scale, locations[:, 1])))
+
+        off_m = haversine_km(locations[:, 0], locations[:, 1], self.lon[nodes], self.lat[nodes]) * 1000
+        if np.any(off_m > max_distance_m):
+            lon, lat = locations[np.argmax(off_m)]
+            raise OrsApiError(404, f"Could not find routable point within {max_distance_m:.0f} m of {lon}, {lat}")
+
+        return nodes
+
+    def edge_index(self, frm, to):
+        return np.searchsorted(self.edge_keys, frm.astype(np.int64) * len(self.lon) + to)
+
+    def region(self, source, targets, budget_km):
+        # Nodes a path of at most budget_km (per target) from source to a target can pass through
+        ball = self._tree.query_ball_point((self.lon[source] * self._lon_scale, self.lat[source]),
+                                           float(budget_km.max()) / KM_PER_DEGREE * self._ball_scale)
+        nodes = np.asarray(ball, dtype=np.int64)
+        from_source = haversine_km(self.lon[source], self.lat[source], self.lon[nodes], self.lat[nodes])
+        if len(targets) == 1:
+            # Ellipse with the endpoints as foci, the ball around the source alone is about four times larger
+            to_target = haversine_km(self.lon[nodes], self.lat[nodes], self.lon[targets[0]], self.lat[targets[0]])
+            nodes = nodes[from_source + to_target <= budget_km[0]]
+        else:
+            nodes = nodes[from_source <= budget_km.max()]
+        return np.union1d(nodes, np.append(targets, source))
+
+    def search(self, nodes, source, targets):
+        # Dijkstra from source over the edges between the given (sorted) nodes
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+        edges = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        heads = self.indices[edges]
+        columns = np.searchsorted(nodes, heads).clip(max=len(nodes) - 1)
+        inside = nodes[columns] == heads
+
+        rows = np.repeat(np.arange(len(nodes)), counts)[inside]
+        subgraph = csr_matrix((self.time_s[edges[inside]], (rows, columns[inside])), shape=(len(nodes), len(nodes)))
+        times, predecessors = dijkstra(subgraph, indices=np.searchsorted(nodes, source), return_predecessors=True)
+
+        return PathTree(nodes, times, predecessors, np.searchsorted(nodes, targets))
+
+    def shortest_path_tree(self, source, targets):
+        # Shortest-time paths from source to the targets, exact: a faster path than the one found in a region
+        # would be within (time found) * max speed road km of both ends, so inside a region of that budget
+        budget_km = haversine_km(self.lon[source], self.lat[source],
+                                 self.lon[targets], self.lat[targets]) * SEARCH_DETOUR + SEARCH_MARGIN_KM
+        while True:
+            tree = self.search(self.region(source, targets, budget_km), source, targets)
+            needed_km = tree.target_times() / 3600 * self.max_speed_kmh
+            if np.all(needed_km <= budget_km) or len(tree.nodes) == len(self.lon):
+                return tree
+            # One more search with the bound the first found, unless the region cut a target off
+            budget_km = np.where(np.isfinite(needed_km), np.maximum(needed_km, budget_km), budget_km * 4)
+
+    def tree_lengths(self, tree):
+        # Length (m) of the shortest-time path to each target, by pointer jumping up the predecessor tree
+        predecessors = tree.predecessors
+        reached = np.flatnonzero(predecessors >= 0)
+        if not len(reached):
+            return np.zeros(len(tree.targets))
+
+        # Tree restricted to the reached nodes plus the root, which gets the last position
+        local = np.full(len(predecessors), len(reached), dtype=np.int64)
+        local[reached] = np.arange(len(reached))
+        parent = np.append(local[predecessors[reached]], len(reached))
+        edges = self.edge_index(tree.nodes[predecessors[reached]], tree.nodes[reached])
+        length = np.append(self.length_m[edges], 0.0)
+
+        # Each round adds the parent's length so far and skips to the grandparent, the root has length 0
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            length = length + length[parent]
+            parent = grandparent
+
+        return length[local[tree.targets]]
+
+
+class LocalRoutingClient:
+    """Routing backend answering directions and matrix calls from a local RoadGraph.
+
+    Same methods and response shapes as AsyncOrsClient (the parts the app reads),
+    so open_route and its caches work unchanged. No network calls and no quota,
+    searches run in threads to keep the event loop free.
+    """
+
+    def __init__(self, graph, max_snap_distance=5000.0, max_concurrency=2):
+        self.graph = graph  # Callable returning the RoadGraph, so loading can be deferred
+        self.max_snap_distance = max_snap_distance
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(self, endpoint, fn, *args):
+        async with self._semaphore:
+            with timed(f"routing_{endpoint}", ORS_REQUEST_SECONDS, endpoint=endpoint):
+                return await asyncio.to_thread(fn, *args)
+
+    async def directions(self, coordinates, profile="driving-car", timeout=None):
+        check_profile(profile)
+        return await self._run("directions", self._directions, coordinates)
+
+    async def distance_matrix(self, locations, profile="driving-car", metrics=None, units=None,
+                              sources=None, destinations=None, timeout=None):
+        check_profile(profile)
+        return await self._run("matrix", self._matrix, locations, metrics, units, sources, destinations)
+
+    def _directions(self, coordinates):
+        graph = self.graph()
+        waypoints = graph.snap(coordinates, self.max_snap_distance)
+
+        # One leg per consecutive pair of waypoints, joined into a single path
+        nodes = [waypoints[:1]]
+        for source, target in zip(waypoints[:-1], waypoints[1:]):
+            tree = graph.shortest_path_tree(source, np.array([target]))
+            if not np.isfinite(tree.target_times()[0]):
+                raise OrsApiError(404, "Route could not be found between the given coordinates")
+            nodes.append(tree.path(0)[1:])
+        nodes = np.concatenate(nodes)
+
+        if len(nodes) < 2:
+            nodes = np.repeat(nodes, 2)  # Same start and end, ORS also answers with a two-point line
+
+        # Repeated nodes (a waypoint on the path) are not edges
+        moved = nodes[:-1] != nodes[1:]
+        edges = graph.edge_index(nodes[:-1][moved], nodes[1:][moved])
+        edge_time, edge_length = np.zeros(len(nodes) - 1), np.zeros(len(nodes) - 1)
+        edge_time[moved], edge_length[moved] = graph.time_s[edges], graph.length_m[edges]
+
+        bounds = list(range(0, len(nodes) - 1, STEP_EDGES)) + [len(nodes) - 1]
+        steps = [
+            {
+                "way_points": [a, b],
+                "distance": round(float(edge_length[a:b].sum()), 1),
+                "duration": round(float(edge_time[a:b].sum()), 1)
+            } for a, b in zip(bounds[:-1], bounds[1:])
+        ]
+        summary = {"distance": round(float(edge_length.sum()), 1), "duration": round(float(edge_time.sum()), 1)}
+
+        return {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": np.column_stack((graph.lon[nodes], graph.lat[nodes])).round(6).tolist()
+                },
+                "properties": {"segments": [{**summary, "steps": steps}], "summary": summary}
+            }]
+        }
+
+    def _matrix(self, locations, metrics, units, sources, destinations):
+        graph = self.graph()
+        nodes = graph.snap(locations, self.max_snap_distance)
+        sources = list(range(len(locations))) if sources is None else sources
+        target_nodes = nodes[list(range(len(locations))) if destinations is None else destinations]
+        with_distances = metrics is not None and "distance" in metrics
+        scale = 1000.0 if units == "km" else 1.0
+
+        # One search per distinct source node, over the region around it and the destinations
+        source_nodes, row_of = np.unique(nodes[sources], return_inverse=True)
+        durations, distances = {}, {}
+        for source in source_nodes.tolist():
+            tree = graph.shortest_path_tree(source, target_nodes)
+            durations[source] = tree.target_times()
+            if with_distances:
+                distances[source] = graph.tree_lengths(tree) / scale
+
+        # ORS answers null for pairs it cannot route
+        result = {}
+        if metrics is None or "duration" in metrics:
+            result["durations"] = [
+                [None if np.isinf(t) else round(float(t), 2) for t in durations[source]]
+                for source in source_nodes[row_of].tolist()
+            ]
+        if with_distances:
+            result["distances"] = [
+                [None if np.isinf(t) else round(float(d), 3) for t, d in zip(durations[source], distances[source])]
+                for source in source_nodes[row_of].tolist()
+            ]
+
+        return result
+
+    async def aclose(self):
+        pass
+
+
+def check_profile(profile):
+    if profile != "driving-car":
+        raise OrsApiError(400, f"Profile {profile} is not supported by the local routing engine")
+
+
+def build_road_graph(osm_path):
+    """CSR road graph of the drivable ways in an OSM extract, largest strongly connected part only."""
+    try:
+        import osmium
+    except ImportError:
+        raise RuntimeError("Building the road graph needs the osmium package, install processor[routing]")
+
+    frm, to, speeds, node_ids, node_lon, node_lat = [], [], [], [], [], []
+
+    class WayHandler(osmium.SimpleHandler):
+        def way(self, way):
+            tags = way.tags
+            highway = tags.get("highway")
+            if highway not in SPEED_KMH or tags.get("access") in ("no", "private") \
+                    or tags.get("motor_vehicle") == "no" or tags.get("area") == "yes":
+                return
+
+            maxspeed = tags.get("maxspeed", "")
+            speed = float(maxspeed) if maxspeed.isdigit() else SPEED_KMH[highway]
+            oneway = tags.get("oneway", "yes" if highway in ("motorway", "motorway_link") else "no")
+
+            refs = []
+            for node in way.nodes:
+                if node.location.valid():
+                    refs.append(node.ref)
+                    node_ids.append(node.ref)
+                    node_lon.append(node.location.lon)
+                    node_lat.append(node.location.lat)
+
+            pairs = list(zip(refs[:-1], refs[1:]))
+            if oneway == "-1":
+                pairs = [(b, a) for a, b in pairs]
+            elif oneway not in ("yes", "true", "1"):
+                pairs += [(b, a) for a, b in pairs]
+
+            frm.extend(a for a, _ in pairs)
+            to.extend(b for _, b in pairs)
+            speeds.extend([speed] * len(pairs))
+
+    WayHandler().apply_file(osm_path, locations=True)
+
+    # OSM node ids to dense indices
+    ids, first = np.unique(np.asarray(node_ids, dtype=np.int64), return_index=True)
+    lon = np.asarray(node_lon, dtype=np.float64)[first]
+    lat = np.asarray(node_lat, dtype=np.float64)[first]
+    u = np.searchsorted(ids, np.asarray(frm, dtype=np.int64))
+    v = np.searchsorted(ids, np.asarray(to, dtype=np.int64))
+
+    length_m = haversine_km(lon[u], lat[u], lon[v], lat[v]) * 1000
+    time_s = np.maximum(length_m / (np.asarray(speeds) / 3.6), 0.01)  # No zero weights, Dijkstra reads them as edges
+
+    return compact_graph(u, v, time_s, length_m, lon, lat)
+
+
+def compact_graph(u, v, time_s, length_m, lon, lat):
+    # Fastest of parallel edges, without self loops, restricted to the largest strongly connected component
+    keep = u != v
+    u, v, time_s, length_m = u[keep], v[keep], time_s[keep], length_m[keep]
+
+    order = np.lexsort((time_s, v, u))
+    u, v, time_s, length_m = u[order], v[order], time_s[order], length_m[order]
+    first = np.ones(len(u), dtype=bool)
+    first[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+    u, v, time_s, length_m = u[first], v[first], time_s[first], length_m[first]
+
+    n = len(lon)
+    _, labels = connected_components(csr_matrix((time_s, (u, v)), shape=(n, n)), connection="strong")
+    largest = np.argmax(np.bincount(labels))
+    in_component = labels == largest
+    keep = in_component[u] & in_component[v]
+
+    renumber = np.cumsum(in_component) - 1
+    u, v = renumber[u[keep]], renumber[v[keep]]
+
+    return {
+        "indptr": np.concatenate(([0], np.cumsum(np.bincount(u, minlength=int(in_component.sum()))))).astype(np.int64),
+        "indices": v.astype(np.int32),
+        "time_s": time_s[keep].astype(np.float32),
+        "length_m": length_m[keep].astype(np.float32),
+        "lon": lon[in_component],
+        "lat": lat[in_component],
+    }
+
+
+if __name__ == "__main__":
+    # Offline preprocessing, run from the processor directory:
+    #   python -m app.services.local_routing finland-latest.osm.pbf road_graph.npz
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build the local routing graph from an OSM extract")
+    parser.add_argument("osm", help="OSM extract, .osm.pbf or .osm")
+    parser.add_argument("output", help="Graph file, .npz")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    arrays = build_road_graph(args.osm)
+    np.savez(args.output, **arrays)
+    print(f"Wrote {args.output} with {len(arrays['lon'])} nodes and {len(arrays['indices'])} edges "
+          f"in {time.perf_counter() - start:.1f}s")
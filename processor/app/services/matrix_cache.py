@@ -0,0 +1,166 @@
+import json
+import sqlite3
+import time
+from app.services.route_cache import snap
+from app.services.sqlite_store import SqliteDatabase
+
+
+# Keys per SELECT, older SQLite builds allow 999 bind parameters
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _get_many(conn, keys):
+    now = time.time()
+    found = {}
+    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT key, duration, distance FROM matrix_cache WHERE key IN ({placeholders}) AND expires_at > ?",
+            [*chunk, now],
+        ).fetchall()
+        found.update((key, (duration, distance)) for key, duration, distance in rows)
+
+    return [found.get(key) for key in keys]
+
+
+def _set_many(conn, items, ttl):
+    expires_at = time.time() + ttl
+    conn.executemany(
+        "INSERT OR REPLACE INTO matrix_cache (key, duration, distance, expires_at) VALUES (?, ?, ?, ?)",
+        [(key, duration, distance, expires_at) for key, (duration, distance) in items],
+    )
+
+
+def _purge_expired(conn):
+    conn.execute("DELETE FROM matrix_cache WHERE expires_at <= ?", (time.time(),))
+
+
+class SqliteMatrixStore:
+    """Local persistent store, survives restarts and is shared by workers on one host.
+
+    Another process holding the write lock longer than timeout turns a lookup
+    into misses and drops a write, it is only a cache.
+    """
+
+    def __init__(self, path, timeout):
+        self.db = SqliteDatabase(path, timeout, [
+            "CREATE TABLE IF NOT EXISTS matrix_cache ("
+            " key TEXT PRIMARY KEY,"
+            " duration REAL NOT NULL,"
+            " distance REAL NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        ])
+        self.errors = 0
+
+    async def get_many(self, keys):
+        try:
+            return await self.db.run(_get_many, keys)
+        except sqlite3.OperationalError:
+            self.errors += 1
+            return [None] * len(keys)
+
+    async def set_many(self, items, ttl):
+        try:
+            await self.db.run(_set_many, items, ttl)
+        except sqlite3.OperationalError:
+            self.errors += 1
+
+    async def purge_expired(self):
+        try:
+            await self.db.run(_purge_expired)
+        except sqlite3.OperationalError:
+            self.errors += 1
+
+
+class RedisMatrixStore:
+    """Shared store for multi-host deployments, requires the optional redis package."""
+
+    def __init__(self, url):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("MATRIX_CACHE_BACKEND=redis requires the 'redis' package") from e
+
+        self._redis = redis.from_url(url)
+
+    async def get_many(self, keys):
+        values = await self._redis.mget([f"eta:{key}" for key in keys])
+        return [tuple(json.loads(v)) if v is not None else None for v in values]
+
+    async def set_many(self, items, ttl):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in items:
+                pipe.set(f"eta:{key}", json.dumps(value), ex=int(ttl))
+            await pipe.execute()
+
+    async def purge_expired(self):
+        # Redis expires keys on its own
+        pass
+
+
+class MatrixCache:
+    """(snapped origin, station_id) -> (duration s, distance km) cache for ORS matrix results."""
+
+    def __init__(self, store, ttl, grid):
+        self.store = store
+        self.ttl = ttl
+        self.grid = grid
+        self.hits = 0
+        self.misses = 0
+        self.ors_calls = 0
+
+    def origin_key(self, origin):
+        return "%s,%s" % snap(origin, self.grid)
+
+    def station_key(self, station_id, location):
+        # Stations without an id (should not happen) fall back to their snapped location
+        if station_id is None:
+            return "%s,%s" % snap(location, self.grid)
+        return station_id
+
+    def key(self, origin, station_id, location):
+        return f"{self.origin_key(origin)}:{self.station_key(station_id, location)}"
+
+    async def get_many(self, keys):
+        if self.store is None:
+            self.misses += len(keys)
+            return [None] * len(keys)
+
+        values = await self.store.get_many(keys)
+        hits = sum(v is not None for v in values)
+        self.hits += hits
+        self.misses += len(keys) - hits
+
+        return values
+
+    async def set_many(self, items):
+        # Unreachable destinations come back as None, those are not cached
+        items = [(key, value) for key, value in items if None not in value]
+
+        if self.store is not None and items:
+            await self.store.set_many(items, self.ttl)
+
+    async def purge_expired(self):
+        if self.store is not None:
+            await self.store.purge_expired()
+
+    def stats(self):
+        return {
+            "backend": type(self.store).__name__ if self.store is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "ors_calls": self.ors_calls,
+            "store_errors": getattr(self.store, "errors", 0),
+        }
+
+
+def create_matrix_store(backend, path, redis_url, sqlite_timeout):
+    if backend == "sqlite":
+        return SqliteMatrixStore(path, sqlite_timeout)
+    if backend == "redis":
+        return RedisMatrixStore(redis_url)
+    if backend == "none":
+        return None
+
+    raise ValueError(f"Unknown MATRIX_CACHE_BACKEND: {backend}")
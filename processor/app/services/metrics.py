@@ -0,0 +1,134 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "processor_http_request_seconds", "HTTP request latency", ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "processor_stage_seconds", "Latency per request pipeline stage", ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+ORS_REQUEST_SECONDS = Histogram(
+    "processor_ors_request_seconds", "OpenRouteService HTTP call latency, excluding rate limit waits", ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+ORS_QUEUE_SECONDS = Histogram(
+    "processor_ors_queue_wait_seconds", "Time waited for an OpenRouteService rate limit slot", ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+ORS_ERRORS = Counter(
+    "processor_ors_errors_total", "OpenRouteService responses with status >= 400", ["endpoint", "status"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "processor_db_query_seconds", "Database query latency", ["query"],
+    buckets=LATENCY_BUCKETS,
+)
+PREDICT_SECONDS = Histogram(
+    "processor_model_predict_seconds", "Charging time model predict latency",
+    buckets=LATENCY_BUCKETS,
+)
+PREDICT_BATCH_SIZE = Histogram(
+    "processor_model_predict_batch_size", "Stations per charging time model predict call",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+
+# (name, seconds) of every timed block in the current request, set by the middleware when asked for
+request_timings = ContextVar("request_timings", default=None)
+
+# OpenTelemetry tracer, None keeps tracing a no-op
+tracer = None
+
+
+def configure_tracing(exporter, service_name):
+    global tracer
+
+    if exporter == "none":
+        return
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        raise RuntimeError("OTEL_EXPORTER needs the opentelemetry-sdk package, install processor[otel]")
+
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        span_exporter = OTLPSpanExporter()  # Endpoint from the standard OTEL_EXPORTER_OTLP_* variables
+    elif exporter == "console":
+        span_exporter = ConsoleSpanExporter()
+    else:
+        raise ValueError(f"Unknown OTEL_EXPORTER: {exporter}")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(provider)
+    tracer = trace.get_tracer("processor")
+
+
+@contextmanager
+def timed(name, histogram=None, **labels):
+    """Times the block into a histogram (STAGE_SECONDS by default), the request timings and a span."""
+    start = perf_counter()
+
+    with tracer.start_as_current_span(name) if tracer is not None else nullcontext():
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+
+            if histogram is None:
+                STAGE_SECONDS.labels(stage=name).observe(elapsed)
+            elif labels:
+                histogram.labels(**labels).observe(elapsed)
+            else:
+                histogram.observe(elapsed)
+
+            timings = request_timings.get()
+            if timings is not None:
+                timings.append((name, elapsed))
+
+
+def server_timing(timings):
+    # Server-Timing header value, durations in ms
+    return ", ".join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in timings)
+
+
+class StatsCollector:
+    """Exposes the existing stats() dicts (caches, scheduler, coalescing) as Prometheus gauges."""
+
+    def __init__(self):
+        self._sources = {}
+
+    def register(self, name, stats, label=None):
+        # label: stats() returns {label value: {key: value}} instead of {key: value}
+        self._sources[name] = (stats, label)
+
+    def collect(self):
+        for name, (stats, label) in self._sources.items():
+            rows = stats().items() if label else [(None, stats())]
+            families = {}
+
+            for label_value, row in rows:
+                for key, value in row.items():
+                    if isinstance(value, bool) or not isinstance(value, (int, float)):
+                        continue
+
+                    if key not in families:
+                        families[key] = GaugeMetricFamily(
+                            f"processor_{name}_{key}", f"{name} {key}", labels=[label] if label else []
+                        )
+                    families[key].add_metric([label_value] if label else [], value)
+
+            yield from families.values()
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
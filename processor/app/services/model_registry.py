@@ -0,0 +1,57 @@
+import threading
+import time
+from app.config import logger
+
+
+class ModelRegistry:
+    """Loads trained models on first use or during a background warm-up.
+
+    Keeps joblib/LightGBM out of import time, so the app starts serving
+    /health straight away and the readiness probe waits for the models.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._warm = []  # Loaded by warm_up and required by is_ready, the rest only on first use
+        self._models = {}
+        self._load_times = {}
+        self._lock = threading.RLock()  # Loaders may depend on other registered models
+
+    def register(self, name, loader, warm_up=True):
+        self._loaders[name] = loader
+        if warm_up:
+            self._warm.append(name)
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        # Only one thread loads, the others wait for it
+        with self._lock:
+            if name not in self._models:
+                start = time.perf_counter()
+                self._models[name] = self._loaders[name]()
+                self._load_times[name] = time.perf_counter() - start
+                logger.info("Loaded model %s in %.2fs", name, self._load_times[name],
+                            extra={"model": name, "load_s": round(self._load_times[name], 2)})
+
+        return self._models[name]
+
+    def warm_up(self):
+        for name in self._warm:
+            self.get(name)
+
+    def is_ready(self):
+        return all(name in self._models for name in self._warm)
+
+    def status(self):
+        return {
+            name: {
+                "loaded": name in self._models,
+                "load_time_s": round(self._load_times[name], 3) if name in self._load_times else None
+            } for name in self._loaders
+        }
+
+
+registry = ModelRegistry()
@@ -1,14 +1,81 @@
-from shapely.geometry import LineString
 from app.config import settings
-from app.constants import BUFFERED_ZONE
-import openrouteservice
-from openrouteservice import exceptions
-import geopandas as gpd
-from math import radians, sin, cos, sqrt, atan2
+from app.services.ors_client import AsyncOrsClient, OrsApiError
+from app.services.ors_scheduler import OrsScheduler
+from app.services.route_cache import RouteCache
+from app.services.matrix_cache import MatrixCache, create_matrix_store
+from app.services.corridor import buffer_corridor
+from app.services.route_sampling import expand_route, sample_route
+from app.services.candidate_ranking import ProjectedRoute, rank_candidates
+from app.services.single_flight import SingleFlight
+from app.services.model_registry import registry
+from fastapi.concurrency import run_in_threadpool
+import asyncio
+import numpy as np
 
 
-client = openrouteservice.Client(key=settings.OPEN_ROUTE_SERVICE_API_KEY)
 # Current limits https://account.heigit.org/manage/key
+scheduler = OrsScheduler(
+    limits={
+        "directions": (settings.ORS_DIRECTIONS_PER_MINUTE, settings.ORS_DIRECTIONS_PER_DAY),
+        "matrix": (settings.ORS_MATRIX_PER_MINUTE, settings.ORS_MATRIX_PER_DAY),
+    },
+    queue_timeout=settings.ORS_QUEUE_TIMEOUT,
+    retry_attempts=settings.ORS_RETRY_ATTEMPTS,
+    backoff_base=settings.ORS_BACKOFF_BASE,
+    backoff_max=settings.ORS_BACKOFF_MAX,
+)
+
+def create_routing_client(backend):
+    # Both backends answer directions and distance_matrix with ORS shaped responses
+    if backend == "ors":
+        return AsyncOrsClient(
+            key=settings.OPEN_ROUTE_SERVICE_API_KEY,
+            base_url=settings.ORS_BASE_URL,
+            max_connections=settings.ORS_MAX_CONNECTIONS,
+            max_concurrency=settings.ORS_MAX_CONCURRENCY,
+            timeout=settings.ORS_TIMEOUT,
+            http2=settings.ORS_HTTP2,
+            scheduler=scheduler if settings.ORS_SCHEDULER_ENABLED else None,
+        )
+    if backend == "local":
+        # Deferred, only the local engine needs scipy, the graph is loaded by the registry warm-up
+        from app.services.local_routing import LocalRoutingClient, RoadGraph
+
+        registry.register("road_graph", lambda: RoadGraph.load(settings.LOCAL_ROUTING_GRAPH))
+        return LocalRoutingClient(
+            graph=lambda: registry.get("road_graph"),
+            max_snap_distance=settings.LOCAL_ROUTING_MAX_SNAP_DISTANCE,
+            max_concurrency=settings.LOCAL_ROUTING_MAX_CONCURRENCY,
+        )
+
+    raise ValueError(f"Unknown ROUTING_BACKEND: {backend}")
+
+
+client = create_routing_client(settings.ROUTING_BACKEND)
+
+# Shared by get_location_range and get_route_locations
+route_cache = RouteCache(
+    maxsize=settings.ROUTE_CACHE_SIZE,
+    ttl=settings.ROUTE_CACHE_TTL,
+    grid=settings.ROUTE_CACHE_GRID,
+)
+
+# Per-station ETA memo, mostly saves the polling from /api/calculate-eta
+matrix_cache = MatrixCache(
+    store=create_matrix_store(
+        settings.MATRIX_CACHE_BACKEND,
+        settings.MATRIX_CACHE_PATH,
+        settings.MATRIX_CACHE_REDIS_URL,
+        settings.MATRIX_CACHE_SQLITE_TIMEOUT,
+    ),
+    ttl=settings.MATRIX_CACHE_TTL,
+    grid=settings.MATRIX_CACHE_GRID,
+)
+
+
+# Identical ORS calls in flight at the same time share one request
+route_flights = SingleFlight()
+matrix_flights = SingleFlight()
 
 
 class RoutingServiceError(Exception):
@@ -16,150 +83,200 @@ class RoutingServiceError(Exception):
     pass
 
 
-def haversine(lon1, lat1, lon2, lat2):
-    R = 6371.0  # Earth radius in km
-    dlon = radians(lon2 - lon1)
-    dlat = radians(lat2 - lat1)
+async def get_route(source, destination):
+    # source: (lon, lat)
+    # destination: (lon, lat)
+    key = route_cache.key(source, destination)
+    entry = route_cache.get(key)
 
-    a = sin(dlat / 2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    if entry is not None:
+        return entry
 
-    return R * c
+    # Keyed like the cache, callers in the same cells wait for the first request
+    return await route_flights.run(key, fetch_route, key, source, destination)
 
 
-def get_location_range(current_location, destination):
-    # source: (lon, lat)
-    # destination: (lon, lat)
-    coords = [current_location, destination]
+async def fetch_route(key, source, destination):
+    return route_cache.set(key, await request_route(source, destination))
+
+
+async def request_route(source, destination):
+    coords = [source, destination]
 
     # Request the route geometry
     try:
-        route = client.directions(
+        return await client.directions(
             coordinates=coords,
-            profile="driving-car",
-            format="geojson"
+            profile="driving-car"
         )
-    except exceptions.ApiError as e:
+    except OrsApiError as e:
         raise RoutingServiceError(f"OpenRouteService API error: {str(e)}")
     except Exception as e:
         raise RoutingServiceError(f"Unexpected error: {str(e)}")
 
+
+async def get_location_range(current_location, destination, executor=None):
+    entry = await get_route(current_location, destination)
+
+    if entry.buffer is not None:
+        route_cache.buffer_hits += 1
+        return entry.buffer
+
     # Extract coordinates of the route (as (lon, lat))
-    route_coords = route["features"][0]["geometry"]["coordinates"]
+    route_coords = entry.route["features"][0]["geometry"]["coordinates"]
+
+    # Buffering is CPU bound, keep it off the event loop, on a process pool when one is given
+    if executor is None:
+        entry.buffer = await run_in_threadpool(buffer_corridor, route_coords)
+    else:
+        entry.buffer = await asyncio.get_running_loop().run_in_executor(executor, buffer_corridor, route_coords)
+    route_cache.buffer_misses += 1
 
-    # Convert route to a LineString
-    line = LineString(route_coords)
+    return entry.buffer
 
-    # ORS coordinates are in lon/lat, so first project to metric (meters) CRS
-    gdf = gpd.GeoDataFrame(geometry=[line], crs="EPSG:4326")
-    gdf = gdf.to_crs(epsg=3857)  # Web Mercator, in meters
 
-    buffered = gdf.buffer(BUFFERED_ZONE)  # BUFFERED_ZONE m each side
+async def get_ranked_candidates(current_location, destination, stations, max_distance_km, top_k):
+    entry = await get_route(current_location, destination)
 
-    # Convert back to lat/lon
-    buffered = gpd.GeoDataFrame(geometry=buffered, crs="EPSG:3857").to_crs(epsg=4326)
+    # Projecting the route is CPU bound like buffering, done once per cached route
+    if entry.projected is None:
+        entry.projected = await run_in_threadpool(ProjectedRoute, entry.route["features"][0]["geometry"]["coordinates"])
 
-    return buffered  # min_lon, min_lat, max_lon, max_lat
+    return await run_in_threadpool(rank_candidates, entry.projected, current_location, stations, max_distance_km, top_k)
 
 
-def get_driving_etas(current_location, stations):
-    locations = [current_location] + [tuple(st["location"]) for st in stations]
+async def get_matrix(origins, destinations):
+    # One ORS Matrix call, rows of (duration s, distance km) per origin
+    key = (normalize(origins), normalize(destinations))
+    return await matrix_flights.run(key, fetch_matrix, origins, destinations)
 
-    # Call ORS Matrix API (driving duration in seconds)
+
+def normalize(locations):
+    return tuple((round(lon, 6), round(lat, 6)) for lon, lat in locations)
+
+
+async def fetch_matrix(origins, destinations):
     try:
-        matrix = client.distance_matrix(
-            locations=locations,
+        matrix = await client.distance_matrix(
+            locations=origins + destinations,
             profile="driving-car",
             metrics=["duration", "distance"],
             units="km",
-            sources=[0],  # only from current_location
-            destinations=list(range(1, len(stations) + 1))
+            sources=list(range(len(origins))),
+            destinations=list(range(len(origins), len(origins) + len(destinations)))
         )
-    except exceptions.ApiError as e:
+    except OrsApiError as e:
         raise RoutingServiceError(f"OpenRouteService API error: {str(e)}")
     except Exception as e:
         raise RoutingServiceError(f"Unexpected error: {str(e)}")
+    matrix_cache.ors_calls += 1
 
-    durations = matrix["durations"][0]
-    distances = matrix["distances"][0]
+    return [list(zip(durations, distances)) for durations, distances in zip(matrix["durations"], matrix["distances"])]
 
-    for i, r in enumerate(stations):
-        r["travel_time_min"] = round(durations[i] / 60)
-        r["distance_km"] = round(distances[i], 2)
 
-    return stations
+def chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
 
 
-def get_route_locations(source, destination, interval_min):
-    # source: (lon, lat)
-    # destination: (lon, lat)
-    coords = [source, destination]
+async def get_travel_times(pairs, max_destinations=None):
+    # pairs: [(origin (lon, lat), station_id, station (lon, lat))] -> [(duration s, distance km)]
+    keys = [matrix_cache.key(*pair) for pair in pairs]
+    values = await matrix_cache.get_many(keys)
 
-    # Request the route geometry
-    try:
-        route = client.directions(
-            coordinates=coords,
-            profile="driving-car",
-            format="geojson"
-        )
-    except exceptions.ApiError as e:
-        raise RoutingServiceError(f"OpenRouteService API error: {str(e)}")
-    except Exception as e:
-        raise RoutingServiceError(f"Unexpected error: {str(e)}")
-    
-    geometry = route["features"][0]["geometry"]["coordinates"]
-    steps = route["features"][0]["properties"]["segments"][0]["steps"]
-    interval_sec = interval_min * 60
-    current_time = 0
-    current_dist = 0
-    next_sample_time = 0
-    # Expand geometry into a time-stamped polyline
-    expanded = []  # (lon, lat, cumulative_time_sec, cumulative_dist_km)
-
-    for step in steps:
-        start_idx, end_idx = step["way_points"]
-        step_coords = geometry[start_idx:end_idx + 1]
-        duration = step["duration"]  # seconds
-
-        # Evenly distribute time across step geometry
-        if len(step_coords) > 1:
-            per_segment_time = duration / (len(step_coords) - 1)
-        else:
-            per_segment_time = duration
-
-        prev_lon, prev_lat = step_coords[0]
-
-        # Add first point of the step
-        expanded.append((prev_lon, prev_lat, current_time, current_dist))
-
-        # Move through the rest of the coords
-        for lon, lat in step_coords[1:]:
-            # distance from previous point
-            seg_dist = haversine(prev_lon, prev_lat, lon, lat)
-            current_dist += seg_dist
-            current_time += per_segment_time
-
-            expanded.append((lon, lat, current_time, current_dist))
-
-            prev_lon, prev_lat = lon, lat
+    # Only the pairs missing from the cache go to ORS
+    missing = [i for i, value in enumerate(values) if value is None]
 
-    # Now sample every X minutes
-    samples = []
-    ptr = 0
+    if not missing:
+        return values
+
+    # Callers within one cache cell share an ORS source, stations are deduplicated by cache key
+    origin_idx, station_idx = {}, {}
+    origins, stations, wanted = [], [], set()
+    for i in missing:
+        origin, station_id, location = pairs[i]
+        origin_key = matrix_cache.origin_key(origin)
+        station_key = matrix_cache.station_key(station_id, location)
+
+        if origin_key not in origin_idx:
+            origin_idx[origin_key] = len(origins)
+            origins.append((origin_key, tuple(origin)))
+        if station_key not in station_idx:
+            station_idx[station_key] = len(stations)
+            stations.append((station_key, tuple(location)))
+        wanted.add((origin_idx[origin_key], station_idx[station_key]))
+
+    # ORS answers the whole sources x destinations product, split it to stay under the per-request limit
+    station_chunk = min(len(stations), max_destinations or len(stations), settings.ORS_MATRIX_MAX_ROUTES)
+    origin_chunk = max(1, settings.ORS_MATRIX_MAX_ROUTES // station_chunk)
+    blocks = [
+        (o, s)
+        for o in chunks(list(range(len(origins))), origin_chunk)
+        for s in chunks(list(range(len(stations))), station_chunk)
+        if any((oi, si) in wanted for oi in o for si in s)
+    ]
+
+    rows = await asyncio.gather(*(
+        get_matrix([origins[oi][1] for oi in o], [stations[si][1] for si in s]) for o, s in blocks
+    ))
+
+    # Every returned cell is cached, not only the requested pairs
+    fetched = {}
+    for (o, s), block in zip(blocks, rows):
+        for oi, row in zip(o, block):
+            for si, value in zip(s, row):
+                fetched[f"{origins[oi][0]}:{stations[si][0]}"] = value
+
+    await matrix_cache.set_many(list(fetched.items()))
 
-    while next_sample_time <= expanded[-1][2]:
-        # Move pointer until reaching time >= next_sample_time
-        while ptr < len(expanded) - 1 and expanded[ptr][2] < next_sample_time:
-            ptr += 1
+    for i in missing:
+        values[i] = fetched[keys[i]]
 
-        lon, lat, _, dist = expanded[ptr]
-        samples.append({
-            "lat": lat,
-            "lon": lon,
-            "time_min": round(next_sample_time / 60),
-            "distance_km": round(dist, 3)
-        })
+    return values
 
-        next_sample_time += interval_sec
 
-    return samples
+def travel_time_columns(values):
+    # [(duration s, distance km)] -> mask of the routable rows, travel_time_min and distance_km columns
+    # ORS answers null for a destination it cannot route to, zeroed here so the int cast stays defined
+    values = np.asarray(values, dtype=np.float64).reshape(-1, 2)
+    routable = np.isfinite(values).all(axis=1)
+    values = np.where(routable[:, None], values, 0.0)
+    return routable, {
+        "travel_time_min": np.round(values[:, 0] / 60).astype(np.int64),
+        "distance_km": np.round(values[:, 1], 2)
+    }
+
+
+async def get_driving_etas(current_location, stations):
+    # Smaller chunks than ORS allows, so a long candidate list is fetched in parallel
+    values = await get_travel_times(
+        [(current_location, station_id, location)
+         for station_id, location in zip(stations.station_id.tolist(), stations.locations())],
+        max_destinations=settings.ORS_MATRIX_CHUNK_SIZE
+    )
+
+    # Stations ORS cannot route to are dropped
+    routable, columns = travel_time_columns(values)
+    return stations.with_columns(**columns).take(routable)
+
+
+async def get_expanded_route(source, destination):
+    entry = await get_route(source, destination)
+
+    # Expand geometry into a time-stamped polyline, once per cached route
+    if entry.expanded is None:
+        entry.expanded = expand_route(entry.route)
+
+    return entry.expanded
+
+
+async def get_exact_expanded_route(source, destination):
+    # From source itself, not through the route cache: a cache cell is larger than the distance
+    # a tracked car re-routes at, the cached route could start where the car already left
+    return expand_route(await request_route(source, destination))
+
+
+async def get_route_locations(source, destination, interval_min):
+    expanded = await get_expanded_route(source, destination)
+
+    # Now sample every X minutes
+    return sample_route(expanded, interval_min * 60)
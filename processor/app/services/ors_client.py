@@ -0,0 +1,97 @@
+import asyncio
+import httpx
+from app.services.metrics import timed, ORS_REQUEST_SECONDS, ORS_ERRORS
+
+
+class OrsApiError(Exception):
+    """Raised when OpenRouteService answers with a non-2xx status."""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"{status_code} ({message})")
+        self.status_code = status_code
+        self.message = message
+
+
+class AsyncOrsClient:
+    """Asyncio-native OpenRouteService client.
+
+    Keeps one pooled (HTTP/2 when available) connection per worker and caps
+    the number of in-flight ORS requests so a traffic burst queues here
+    instead of opening a socket per request. An optional scheduler
+    rate limits and prioritises the calls before they take a slot.
+    """
+
+    def __init__(self, key, base_url, max_connections=20, max_concurrency=10, timeout=10.0, http2=True,
+                 scheduler=None):
+        self.key = key
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.http2 = http2
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.scheduler = scheduler
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=self.http2,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                headers={
+                    "Authorization": self.key or "",
+                    "Accept": "application/json, application/geo+json",
+                },
+            )
+        return self._client
+
+    async def _post(self, endpoint, path, body, timeout=None):
+        async def send():
+            async with self._semaphore:
+                with timed(f"ors_{endpoint}", ORS_REQUEST_SECONDS, endpoint=endpoint):
+                    return await self._get_client().post(
+                        path, json=body, timeout=timeout or self.timeout
+                    )
+
+        if self.scheduler is not None:
+            response = await self.scheduler.run(endpoint, send)
+        else:
+            response = await send()
+
+        if response.status_code >= 400:
+            ORS_ERRORS.labels(endpoint=endpoint, status=response.status_code).inc()
+            raise OrsApiError(response.status_code, response.text)
+
+        return response.json()
+
+    async def directions(self, coordinates, profile="driving-car", timeout=None):
+        # Same payload as openrouteservice.Client.directions(format="geojson")
+        return await self._post(
+            "directions",
+            f"/v2/directions/{profile}/geojson",
+            {"coordinates": [list(c) for c in coordinates]},
+            timeout=timeout,
+        )
+
+    async def distance_matrix(self, locations, profile="driving-car", metrics=None, units=None,
+                              sources=None, destinations=None, timeout=None):
+        body = {"locations": [list(c) for c in locations]}
+        if metrics is not None:
+            body["metrics"] = metrics
+        if units is not None:
+            body["units"] = units
+        if sources is not None:
+            body["sources"] = sources
+        if destinations is not None:
+            body["destinations"] = destinations
+
+        return await self._post("matrix", f"/v2/matrix/{profile}", body, timeout=timeout)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
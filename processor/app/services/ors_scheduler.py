@@ -0,0 +1,187 @@
+import asyncio
+import heapq
+import itertools
+import multiprocessing
+import random
+import time
+from contextvars import ContextVar
+from app.services.ors_client import OrsApiError
+from app.services.metrics import timed, ORS_QUEUE_SECONDS
+
+# Priority classes, lower is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Set per request by the routers, ETA polling runs as BACKGROUND
+ors_priority = ContextVar("ors_priority", default=INTERACTIVE)
+
+
+class TokenBucket:
+    """Per-minute token bucket plus a fixed daily allowance, like the ORS key limits.
+
+    The daily count is in shared memory: the workers app.server forks after the
+    bucket was created draw on one allowance, and a recycled worker does not
+    start its day from zero.
+    """
+
+    def __init__(self, per_minute, per_day, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or per_minute
+        self.tokens = float(self.capacity)
+        self.per_day = per_day
+        self.daily = multiprocessing.Array("d", [0, time.time()])  # used today, day started (epoch s)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    @property
+    def used_today(self):
+        return int(self.daily[0])
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        with self.daily.get_lock():
+            if time.time() - self.daily[1] >= 24 * 60 * 60:
+                self.daily[:] = [0, time.time()]
+
+    def exhausted_today(self):
+        return self.per_day is not None and self.daily[0] >= self.per_day
+
+    def delay(self, now):
+        # Seconds until a token can be taken
+        return max(self.paused_until - now, (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0)
+
+    def take(self):
+        # False once the daily allowance is used up, checked and counted under the lock shared with other workers
+        with self.daily.get_lock():
+            if self.exhausted_today():
+                return False
+            self.daily[0] += 1
+
+        self.tokens -= 1
+        return True
+
+
+class EndpointQueue:
+    def __init__(self, name, bucket):
+        self.name = name
+        self.bucket = bucket
+        self.waiters = []  # heap of (priority, seq, future)
+        self.timer = None
+        self.granted = 0
+        self.max_depth = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.throttled = 0
+        self.retries = 0
+        self.rejected = 0
+
+
+class OrsScheduler:
+    """Rate limits outgoing ORS calls per endpoint and serves queued calls by priority.
+
+    A call waits for a token of its endpoint's bucket. When one frees up the
+    highest priority waiter gets it, FIFO within a class. A 429 pauses the whole
+    endpoint and the call is retried with exponential backoff and full jitter.
+    """
+
+    def __init__(self, limits, queue_timeout=10.0, retry_attempts=3, backoff_base=0.5, backoff_max=8.0):
+        # limits: {endpoint: (per_minute, per_day)}
+        self.queues = {endpoint: EndpointQueue(endpoint, TokenBucket(*limit)) for endpoint, limit in limits.items()}
+        self.queue_timeout = queue_timeout
+        self.retry_attempts = retry_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._seq = itertools.count()
+
+    async def run(self, endpoint, send):
+        # send: coroutine function doing the HTTP call, returns the httpx response
+        queue = self.queues[endpoint]
+
+        for attempt in range(self.retry_attempts + 1):
+            await self._acquire(queue, ors_priority.get())
+            response = await send()
+
+            if response.status_code != 429:
+                return response
+
+            queue.throttled += 1
+            if attempt == self.retry_attempts:
+                return response
+
+            queue.retries += 1
+            self._pause(queue, self._backoff(attempt, response.headers.get("Retry-After")))
+
+    def _backoff(self, attempt, retry_after):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+        try:
+            return max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:  # HTTP-date form, rare enough to fall back to our own delay
+            return delay
+
+    def _pause(self, queue, delay):
+        queue.bucket.paused_until = max(queue.bucket.paused_until, time.monotonic() + delay)
+
+    async def _acquire(self, queue, priority):
+        if queue.bucket.exhausted_today():
+            queue.rejected += 1
+            raise OrsApiError(429, "Daily OpenRouteService quota used up")
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(queue.waiters, (priority, next(self._seq), future))
+        queue.max_depth = max(queue.max_depth, len(queue.waiters))
+        self._dispatch(queue)
+
+        try:
+            with timed(f"ors_{queue.name}_queue", ORS_QUEUE_SECONDS, endpoint=queue.name):
+                await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            queue.rejected += 1
+            raise OrsApiError(429, f"Waited over {self.queue_timeout}s for an OpenRouteService slot")
+
+        waited = time.monotonic() - started
+        queue.granted += 1
+        queue.wait_total += waited
+        queue.wait_max = max(queue.wait_max, waited)
+
+    def _dispatch(self, queue):
+        now = time.monotonic()
+        bucket = queue.bucket
+        bucket.refill(now)
+
+        while queue.waiters and bucket.delay(now) <= 0:
+            _, _, future = heapq.heappop(queue.waiters)
+            if future.done():  # Timed out or cancelled while queued
+                continue
+            if not bucket.take():
+                queue.rejected += 1
+                future.set_exception(OrsApiError(429, "Daily OpenRouteService quota used up"))
+                continue
+            future.set_result(None)
+
+        # Wake up again when the next token is due
+        if queue.waiters and queue.timer is None:
+            queue.timer = asyncio.get_running_loop().call_later(bucket.delay(now), self._on_timer, queue)
+
+    def _on_timer(self, queue):
+        queue.timer = None
+        self._dispatch(queue)
+
+    def stats(self):
+        return {
+            endpoint: {
+                "queue_depth": sum(not f.done() for _, _, f in queue.waiters),
+                "max_queue_depth": queue.max_depth,
+                "granted": queue.granted,
+                "wait_avg_ms": round(queue.wait_total / queue.granted * 1000, 1) if queue.granted else 0.0,
+                "wait_max_ms": round(queue.wait_max * 1000, 1),
+                "throttled": queue.throttled,
+                "retries": queue.retries,
+                "rejected": queue.rejected,
+                "tokens": round(queue.bucket.tokens, 2),
+                "used_today": queue.bucket.used_today,
+            } for endpoint, queue in self.queues.items()
+        }
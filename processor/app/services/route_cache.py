@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from shapely.geometry import LineString
+
+
+def snap(coordinate, grid):
+    # Snap a (lon, lat) pair to the cache grid (degrees)
+    lon, lat = coordinate
+    return round(round(lon / grid) * grid, 6), round(round(lat / grid) * grid, 6)
+
+
+class RouteEntry:
+    __slots__ = ("route", "line", "buffer", "expanded", "projected", "expires_at")
+
+    def __init__(self, route, expires_at):
+        self.route = route  # Raw ORS directions response (geojson)
+        self.line = LineString(route["features"][0]["geometry"]["coordinates"])
+        self.buffer = None  # Filled lazily by get_location_range
+        self.expanded = None  # Time-stamped polyline, filled lazily by get_route_locations
+        self.projected = None  # UTM line, filled lazily by get_ranked_candidates
+        self.expires_at = expires_at
+
+
+class RouteCache:
+    """TTL + LRU cache of ORS routes keyed on snapped origin/destination."""
+
+    def __init__(self, maxsize, ttl, grid):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.grid = grid
+        self._entries = OrderedDict()
+        self.route_hits = 0
+        self.route_misses = 0
+        self.buffer_hits = 0
+        self.buffer_misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, origin, destination):
+        return snap(origin, self.grid), snap(destination, self.grid)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+
+        if entry is None:
+            self.route_misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.route_hits += 1
+        return entry
+
+    def set(self, key, route):
+        entry = RouteEntry(route, time.monotonic() + self.ttl)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "route_hits": self.route_hits,
+            "route_misses": self.route_misses,
+            "buffer_hits": self.buffer_hits,
+            "buffer_misses": self.buffer_misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,87 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    # Great-circle distance (km), inputs in degrees
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class ExpandedRoute:
+    """Time-stamped polyline: vertex coordinates with cumulative time (s) and distance (km)."""
+
+    __slots__ = ("lon", "lat", "time_sec", "dist_km")
+
+    def __init__(self, lon, lat, time_sec, dist_km):
+        self.lon = lon
+        self.lat = lat
+        self.time_sec = time_sec
+        self.dist_km = dist_km
+
+    @property
+    def duration_sec(self):
+        return float(self.time_sec[-1])
+
+    @property
+    def length_km(self):
+        return float(self.dist_km[-1])
+
+
+def expand_route(route):
+    # route: ORS directions geojson response
+    feature = route["features"][0]
+    coords = np.asarray(feature["geometry"]["coordinates"], dtype=np.float64)[:, :2]
+    steps = feature["properties"]["segments"][0]["steps"]
+
+    # Each step's duration is spread evenly over the geometry segments it covers
+    segment_time = np.zeros(max(len(coords) - 1, 0))
+    for step in steps:
+        start_idx, end_idx = step["way_points"]
+        if end_idx > start_idx:
+            segment_time[start_idx:end_idx] = step["duration"] / (end_idx - start_idx)
+
+    segment_dist = haversine_km(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+
+    return ExpandedRoute(
+        lon=coords[:, 0],
+        lat=coords[:, 1],
+        time_sec=np.concatenate(([0.0], np.cumsum(segment_time))),
+        dist_km=np.concatenate(([0.0], np.cumsum(segment_dist)))
+    )
+
+
+def interpolate(expanded, times):
+    # Positions and distances at the given times, interpolated between vertices
+    if len(expanded.time_sec) < 2:
+        n = len(times)
+        return np.repeat(expanded.lon, n), np.repeat(expanded.lat, n), np.repeat(expanded.dist_km, n)
+
+    idx = np.clip(np.searchsorted(expanded.time_sec, times, side="left"), 1, len(expanded.time_sec) - 1)
+    t0, t1 = expanded.time_sec[idx - 1], expanded.time_sec[idx]
+    span = t1 - t0
+    frac = np.clip(np.divide(times - t0, span, out=np.ones_like(span), where=span > 0), 0, 1)
+
+    def lerp(values):
+        return values[idx - 1] + frac * (values[idx] - values[idx - 1])
+
+    return lerp(expanded.lon), lerp(expanded.lat), lerp(expanded.dist_km)
+
+
+def sample_route(expanded, interval_sec):
+    # One sample every interval_sec from the start, up to and including the arrival time
+    times = np.arange(int(expanded.duration_sec // interval_sec) + 1) * float(interval_sec)
+    lon, lat, dist = interpolate(expanded, times)
+
+    return [
+        {
+            "lat": sample_lat,
+            "lon": sample_lon,
+            "time_min": time_min,
+            "distance_km": distance_km
+        } for sample_lon, sample_lat, time_min, distance_km in zip(
+            lon.tolist(), lat.tolist(), np.round(times / 60).astype(int).tolist(), np.round(dist, 3).tolist()
+        )
+    ]
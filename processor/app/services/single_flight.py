@@ -0,0 +1,41 @@
+import asyncio
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one upstream call and its result or error.
+
+    Nothing is kept once the call finishes, caching stays with the route and matrix caches.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key, fn, *args):
+        self.calls += 1
+        task = self._inflight.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+
+        # Shielded, a caller that goes away does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the error as retrieved, every waiter may already be gone
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import sqlite3
+import threading
+
+
+class SqliteDatabase:
+    """SQLite file shared by the workers on one host, queried from a worker thread.
+
+    Each process opens its own connection on first use. app.server imports the
+    app in the master and forks, a connection must not be carried into a child.
+    """
+
+    def __init__(self, path, timeout, schema):
+        self.path = path
+        self.timeout = timeout  # s to wait for another process' write lock
+        self.schema = schema  # statements run on connect
+        self._lock = threading.Lock()
+        self._conn = None
+        self._inherited = []
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        if self._conn is not None:
+            # Kept open, closing it in the child could checkpoint or unlink files the parent still uses
+            self._inherited.append(self._conn)
+            self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.schema:
+                conn.execute(statement)
+            self._conn = conn
+        return self._conn
+
+    def _call(self, fn, *args):
+        with self._lock:
+            return fn(self._connection(), *args)
+
+    async def run(self, fn, *args):
+        # fn(connection, *args) in a worker thread, the event loop never waits on the file lock
+        return await asyncio.to_thread(self._call, fn, *args)
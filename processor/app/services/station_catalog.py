@@ -0,0 +1,145 @@
+import asyncio
+import numpy as np
+import shapely
+from fastapi.concurrency import run_in_threadpool
+from app.config import logger
+from app.models.response_models import RestaurantResult, ChargerResult
+from app.models.station_batch import StationBatch
+from app.services.database import get_station_catalog_rows
+
+
+class CatalogSnapshot:
+    """Immutable view of all stations, swapped as a whole on refresh."""
+
+    def __init__(self, stations, restaurants, chargers):
+        # stations: {station_id: row}, restaurants/chargers: {station_id: {id: row}}
+        self.station_ids = np.fromiter(stations, dtype=np.int64, count=len(stations))
+        self.lon = np.array([stations[i].lon for i in self.station_ids], dtype=np.float64)
+        self.lat = np.array([stations[i].lat for i in self.station_ids], dtype=np.float64)
+        self.tree = shapely.STRtree(shapely.points(self.lon, self.lat))
+
+        # Result objects built once per snapshot, queries only pick from them
+        self.stations = {station_id: (st.name, st.address) for station_id, st in stations.items()}
+        self.restaurants = {
+            station_id: [
+                RestaurantResult(r.restaurant_id, r.station_id, r.name, r.address, r.cuisines) for r in rows.values()
+            ] for station_id, rows in restaurants.items()
+        }
+        self.chargers = {
+            station_id: [ChargerResult(c.charger_id, c.connector_type, c.power) for c in rows.values()]
+            for station_id, rows in chargers.items()
+        }
+
+        # Per cuisine / connector boolean masks over station positions, so filtering is vectorized
+        self.cuisine_masks = {}
+        self.connector_masks = {}
+        for pos, station_id in enumerate(self.station_ids.tolist()):
+            for r in self.restaurants.get(station_id, ()):
+                for cuisine in r.cuisines or ():
+                    self._mask(self.cuisine_masks, cuisine)[pos] = True
+            for c in self.chargers.get(station_id, ()):
+                self._mask(self.connector_masks, c.type)[pos] = True
+
+    def _mask(self, masks, key):
+        if key not in masks:
+            masks[key] = np.zeros(len(self.station_ids), dtype=bool)
+        return masks[key]
+
+    def query(self, polygon, cuisines, connector_type):
+        if not len(self.station_ids):
+            return StationBatch.empty()
+
+        candidates = self.tree.query(polygon, predicate="intersects")
+
+        empty = np.zeros(len(self.station_ids), dtype=bool)
+        matches = np.zeros(len(self.station_ids), dtype=bool)
+        for cuisine in cuisines:
+            matches |= self.cuisine_masks.get(cuisine, empty)
+        matches &= self.connector_masks.get(connector_type, empty)
+
+        positions = np.sort(candidates[matches[candidates]])
+        station_ids = self.station_ids[positions].tolist()
+        wanted = set(cuisines)
+
+        return StationBatch.from_rows(
+            station_ids,
+            self.lon[positions],
+            self.lat[positions],
+            [self.stations[station_id][0] for station_id in station_ids],
+            [self.stations[station_id][1] for station_id in station_ids],
+            [
+                [r for r in self.restaurants[station_id] if not wanted.isdisjoint(r.cuisines or ())]
+                for station_id in station_ids
+            ],
+            [
+                [c for c in self.chargers[station_id] if c.type == connector_type]
+                for station_id in station_ids
+            ]
+        )
+
+
+class StationCatalog:
+    """In-process copy of stations, chargers and restaurant cuisines behind an STRtree.
+
+    Answers corridor lookups without a PostGIS round trip. Rows are merged in
+    incrementally using created_at watermarks, a full reload also picks up
+    updates and deletes.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._stations = {}
+        self._restaurants = {}
+        self._chargers = {}
+        self._watermarks = {}
+        self._lock = asyncio.Lock()
+
+    def is_loaded(self):
+        return self._snapshot is not None
+
+    async def load(self, session):
+        async with self._lock:
+            self._stations, self._restaurants, self._chargers, self._watermarks = {}, {}, {}, {}
+            self._merge(*await get_station_catalog_rows(session))
+            # Building the tree and masks is CPU bound, keep it off the event loop
+            self._snapshot = await run_in_threadpool(CatalogSnapshot, self._stations, self._restaurants,
+                                                     self._chargers)
+
+        logger.info("Station catalog loaded with %d stations", len(self._stations),
+                    extra={"stations": len(self._stations)})
+
+    async def refresh(self, session):
+        async with self._lock:
+            stations, restaurants, chargers = await get_station_catalog_rows(session, since=dict(self._watermarks))
+            self._merge(stations, restaurants, chargers)
+
+            if stations or restaurants or chargers:
+                self._snapshot = await run_in_threadpool(CatalogSnapshot, self._stations, self._restaurants,
+                                                         self._chargers)
+
+    def _merge(self, stations, restaurants, chargers):
+        for row in stations:
+            self._stations[row.station_id] = row
+        for row in restaurants:
+            self._restaurants.setdefault(row.station_id, {})[row.restaurant_id] = row
+        for row in chargers:
+            self._chargers.setdefault(row.station_id, {})[row.charger_id] = row
+
+        for table, rows in (("stations", stations), ("restaurants", restaurants), ("chargers", chargers)):
+            if rows:
+                newest = max(row.created_at for row in rows)
+                self._watermarks[table] = max(newest, self._watermarks.get(table, newest))
+
+    def query(self, polygon, cuisines, connector_type):
+        # Same stations as get_stations_from_db
+        return self._snapshot.query(polygon, cuisines, connector_type)
+
+    def stats(self):
+        return {
+            "loaded": self.is_loaded(),
+            "stations": len(self._stations),
+            "watermarks": {table: ts.isoformat() for table, ts in self._watermarks.items()}
+        }
+
+
+station_catalog = StationCatalog()
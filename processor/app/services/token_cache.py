@@ -0,0 +1,76 @@
+import hashlib
+import time
+from collections import OrderedDict
+from app.config import settings
+
+
+class TokenCache:
+    """LRU of verified JWT payloads keyed on the token's SHA-256.
+
+    An entry expires at the token's exp claim, or ttl after it was verified if
+    that is sooner, so a cached token is never accepted after jwt.decode would
+    have rejected it for expiry. Only successfully verified tokens are stored.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # digest: (payload, expires_at epoch s)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, token):
+        # The raw token is a bearer credential, keep only its digest in memory
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self.key(token)
+        entry = self._entries.get(key)
+
+        if entry is not None and entry[1] <= time.time():
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, token, payload):
+        if not self.maxsize:
+            return
+
+        expires_at = time.time() + self.ttl
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+
+        key = self.key(token)
+        self._entries[key] = (payload, expires_at)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+token_cache = TokenCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL)
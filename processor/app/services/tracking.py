@@ -0,0 +1,213 @@
+import json
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+import shapely
+from app.config import settings
+from app.services.corridor import get_transformers, utm_epsg
+from app.services.open_route import get_expanded_route, get_exact_expanded_route
+from app.services.route_sampling import ExpandedRoute
+from app.services.sqlite_store import SqliteDatabase
+
+
+class TrackedRoute:
+    """Expanded route projected to meters, to locate the car on it without ORS."""
+
+    __slots__ = ("expanded", "forward", "line", "along_m")
+
+    def __init__(self, expanded):
+        self.expanded = expanded
+        mid = len(expanded.lon) // 2
+        self.forward, _ = get_transformers(utm_epsg(expanded.lon[mid], expanded.lat[mid]))
+
+        x, y = self.forward.transform(expanded.lon, expanded.lat)
+        self.line = shapely.linestrings(x, y) if len(x) > 1 else shapely.points(x[0], y[0])
+        # Projected distance along the route at each vertex, maps a projection back to time and km
+        self.along_m = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+
+    def locate(self, location):
+        # Remaining time (s), remaining distance (km) and distance off the route (m)
+        x, y = self.forward.transform(*location)
+        point = shapely.points(x, y)
+        along = shapely.line_locate_point(self.line, point) if len(self.along_m) > 1 else 0.0
+        off_route = shapely.distance(self.line, point)
+
+        time_sec = np.interp(along, self.along_m, self.expanded.time_sec)
+        dist_km = np.interp(along, self.along_m, self.expanded.dist_km)
+
+        return (
+            self.expanded.duration_sec - float(time_sec),
+            self.expanded.length_km - float(dist_km),
+            float(off_route)
+        )
+
+
+class TrackingSession:
+    __slots__ = ("session_id", "destination", "route", "reroutes")
+
+    def __init__(self, session_id, destination, route, reroutes=0):
+        self.session_id = session_id
+        self.destination = destination
+        self.route = route
+        self.reroutes = reroutes  # Also the version of the stored route
+
+
+def encode_route(expanded):
+    return np.stack((expanded.lon, expanded.lat, expanded.time_sec, expanded.dist_km)).astype(np.float64).tobytes()
+
+
+def decode_route(blob):
+    return ExpandedRoute(*np.frombuffer(blob, dtype=np.float64).reshape(4, -1))
+
+
+def _insert(conn, session_id, destination, route, ttl, maxsize):
+    now = time.time()
+    conn.execute("DELETE FROM tracking_sessions WHERE expires_at <= ?", (now,))
+    conn.execute(
+        "INSERT INTO tracking_sessions (session_id, destination, route, reroutes, expires_at) VALUES (?, ?, ?, 0, ?)",
+        (session_id, json.dumps(destination), route, now + ttl),
+    )
+    # Least recently updated first, like the LRU this table replaced
+    conn.execute(
+        "DELETE FROM tracking_sessions WHERE session_id IN"
+        " (SELECT session_id FROM tracking_sessions ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+        (maxsize,),
+    )
+
+
+def _touch(conn, session_id, ttl, known_reroutes):
+    # (destination, reroutes, route), route None when known_reroutes is current, None if expired or unknown
+    now = time.time()
+    row = conn.execute(
+        "SELECT destination, reroutes, expires_at FROM tracking_sessions WHERE session_id = ?", (session_id,)
+    ).fetchone()
+    if row is None or row[2] <= now:
+        return None
+
+    destination, reroutes, expires_at = row
+    # Writes at most once a minute per session
+    if now + ttl - expires_at >= 60:
+        conn.execute("UPDATE tracking_sessions SET expires_at = ? WHERE session_id = ?", (now + ttl, session_id))
+
+    route = None
+    if reroutes != known_reroutes:
+        route = conn.execute("SELECT route FROM tracking_sessions WHERE session_id = ?", (session_id,)).fetchone()[0]
+    return tuple(json.loads(destination)), reroutes, route
+
+
+def _reroute(conn, session_id, route):
+    conn.execute("UPDATE tracking_sessions SET route = ?, reroutes = reroutes + 1 WHERE session_id = ?",
+                 (route, session_id))
+    row = conn.execute("SELECT reroutes FROM tracking_sessions WHERE session_id = ?", (session_id,)).fetchone()
+    return row[0] if row is not None else None
+
+
+def _delete(conn, session_id):
+    return conn.execute("DELETE FROM tracking_sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+
+class TrackingSessionStore:
+    """Live-ETA sessions: the route to the reserved station is fetched once, positions are
+    projected onto it locally and ORS is only called again when the car leaves the route.
+
+    Sessions are kept in SQLite, position updates may land on any app.server worker.
+    Each worker keeps the projected routes it has used and reloads one only after
+    another worker re-routed the session.
+    """
+
+    def __init__(self, path, timeout, ttl, maxsize, off_route_distance):
+        self.db = SqliteDatabase(path, timeout, [
+            "CREATE TABLE IF NOT EXISTS tracking_sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " destination TEXT NOT NULL,"
+            " route BLOB NOT NULL,"
+            " reroutes INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS tracking_sessions_expires_at ON tracking_sessions (expires_at)",
+        ])
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.off_route_distance = off_route_distance
+        self._sessions = OrderedDict()  # This worker's copies
+        self.updates = 0
+        self.reroutes = 0
+        self.route_loads = 0
+
+    def _remember(self, session):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+
+        while len(self._sessions) > self.maxsize:
+            self._sessions.popitem(last=False)
+
+    async def get(self, session_id):
+        session = self._sessions.get(session_id)
+        stored = await self.db.run(_touch, session_id, self.ttl, session.reroutes if session else None)
+
+        if stored is None:
+            self._sessions.pop(session_id, None)
+            return None
+
+        destination, reroutes, route = stored
+        if route is not None:
+            self.route_loads += 1
+            session = TrackingSession(session_id, destination, TrackedRoute(decode_route(route)), reroutes)
+
+        self._remember(session)
+        return session
+
+    async def delete(self, session_id):
+        self._sessions.pop(session_id, None)
+        return await self.db.run(_delete, session_id)
+
+    async def start(self, current_location, destination):
+        # Raises RoutingServiceError like the other ORS helpers
+        route = TrackedRoute(await get_expanded_route(current_location, destination))
+        session = TrackingSession(uuid.uuid4().hex, destination, route)
+
+        await self.db.run(_insert, session.session_id, destination, encode_route(route.expanded), self.ttl, self.maxsize)
+        self._remember(session)
+
+        remaining_sec, remaining_km, _ = route.locate(current_location)
+        return self._eta(session, remaining_sec, remaining_km, rerouted=False)
+
+    async def update(self, session, current_location):
+        self.updates += 1
+        remaining_sec, remaining_km, off_route = session.route.locate(current_location)
+        rerouted = off_route > self.off_route_distance
+
+        if rerouted:
+            # Drifted off the corridor, fetch a new route from here
+            session.route = TrackedRoute(await get_exact_expanded_route(current_location, session.destination))
+            reroutes = await self.db.run(_reroute, session.session_id, encode_route(session.route.expanded))
+            session.reroutes = reroutes if reroutes is not None else session.reroutes + 1
+            self.reroutes += 1
+            remaining_sec, remaining_km, _ = session.route.locate(current_location)
+
+        return self._eta(session, remaining_sec, remaining_km, rerouted)
+
+    def _eta(self, session, remaining_sec, remaining_km, rerouted):
+        return {
+            "session_id": session.session_id,
+            "travel_time_min": round(remaining_sec / 60),
+            "distance_km": round(remaining_km, 2),
+            "rerouted": rerouted
+        }
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "updates": self.updates,
+            "reroutes": self.reroutes,
+            "route_loads": self.route_loads
+        }
+
+
+tracking_sessions = TrackingSessionStore(
+    path=settings.TRACKING_STORE_PATH,
+    timeout=settings.TRACKING_STORE_TIMEOUT,
+    ttl=settings.TRACKING_SESSION_TTL,
+    maxsize=settings.TRACKING_SESSION_MAX,
+    off_route_distance=settings.TRACKING_OFF_ROUTE_DISTANCE,
+)
@@ -0,0 +1,118 @@
+# Compare the pandas + sklearn pipeline path with the NumPy predictor engine
+# Run from the processor directory: python -m benchmarks.charging_estimation
+import copy
+import random
+import timeit
+import numpy as np
+import pandas as pd
+from app.constants import TEMPERATURE
+from app.models.response_models import ChargerResult
+from app.models.station_batch import StationBatch
+from app.services.charging_estimation import get_estimate_charging_time
+from app.services.model_registry import registry
+
+EV_MODEL = "Tesla Model 3"
+CURRENT_SOC = 80
+CURRENT_CAR_RANGE = 400
+DESIRED_SOC = 90
+SIZES = (10, 100, 1000)
+REPEAT = 5
+
+
+def make_stations(n, seed=42):
+    rng = random.Random(seed)
+    return [{
+        "station_id": i,
+        "location": (24.9 + rng.random(), 60.2 + rng.random()),
+        "distance_km": round(rng.uniform(1, 450), 2),
+        "travel_time_min": rng.randint(1, 300),
+        "chargers": [{"charger_id": i, "type": "CCS", "max_power": rng.choice((50, 100, 150, 300))}]
+    } for i in range(n)]
+
+
+def to_batch(stations):
+    # The same stations as the engine gets them from the ETA stage
+    batch = StationBatch.from_rows(
+        [st["station_id"] for st in stations],
+        [st["location"][0] for st in stations],
+        [st["location"][1] for st in stations],
+        [None] * len(stations),
+        [None] * len(stations),
+        [[] for _ in stations],
+        [[ChargerResult(**c) for c in st["chargers"]] for st in stations],
+    )
+    return batch.with_columns(
+        travel_time_min=np.array([st["travel_time_min"] for st in stations], dtype=np.int64),
+        distance_km=np.array([st["distance_km"] for st in stations], dtype=np.float64)
+    )
+
+
+def legacy_estimate_charging_time(ev_model, current_soc, current_car_range, desired_soc, stations):
+    # The pre-vectorization implementation, kept here as the baseline
+    available_stations = []
+    soc_rate = current_soc / current_car_range
+
+    for st in stations:
+        st.pop("location", None)
+        soc_at_arrival = round(current_soc - soc_rate * st["distance_km"])
+        if soc_at_arrival < 2:
+            continue
+        st["soc_at_arrival"] = soc_at_arrival
+        available_stations.append(st)
+
+    if not len(available_stations):
+        return []
+
+    test_data = [{
+        "EVModel": ev_model,
+        "min_soc": st["soc_at_arrival"],
+        "soc_diff": desired_soc - st["soc_at_arrival"],
+        "max_power": st["chargers"][0]["max_power"] * 1000,
+        "mean_temp": TEMPERATURE
+    } for st in available_stations]
+
+    model = registry.get("charging_time_model")
+    predictions = pd.Series(model.predict(pd.DataFrame(test_data)))
+
+    for station, pred in zip(available_stations, predictions.tolist()):
+        station["estimate_charging_time_min"] = round(pred / 60)
+
+    return available_stations
+
+
+def bench(fn, stations, number, prepare=copy.deepcopy):
+    # Copy outside the timed region, the legacy implementation mutates the dicts
+    batches = [prepare(stations) for _ in range(number)]
+    it = iter(batches)
+    best = min(timeit.repeat(
+        lambda: fn(EV_MODEL, CURRENT_SOC, CURRENT_CAR_RANGE, DESIRED_SOC, next(it)),
+        number=1, repeat=number
+    ))
+    return best * 1000
+
+
+def main():
+    print(f"{'stations':>8} {'legacy ms':>10} {'engine ms':>10} {'speedup':>8} {'max diff min':>13}")
+
+    for n in SIZES:
+        stations = make_stations(n)
+
+        legacy = legacy_estimate_charging_time(EV_MODEL, CURRENT_SOC, CURRENT_CAR_RANGE, DESIRED_SOC,
+                                               copy.deepcopy(stations))
+        engine = get_estimate_charging_time(EV_MODEL, CURRENT_SOC, CURRENT_CAR_RANGE, DESIRED_SOC,
+                                            to_batch(stations))
+        # With a charging time table in place the estimates are interpolated, everything else must match
+        assert engine.station_id.tolist() == [st["station_id"] for st in legacy] \
+            and engine.soc_at_arrival.tolist() == [st["soc_at_arrival"] for st in legacy], \
+            "engine output differs from the legacy path"
+        max_diff = max((abs(a["estimate_charging_time_min"] - b)
+                        for a, b in zip(legacy, engine.estimate_charging_time_min.tolist())), default=0)
+
+        number = max(REPEAT, 2000 // n)
+        legacy_ms = bench(legacy_estimate_charging_time, stations, number)
+        engine_ms = bench(get_estimate_charging_time, stations, number, prepare=to_batch)
+        print(f"{n:>8} {legacy_ms:>10.3f} {engine_ms:>10.3f} {legacy_ms / engine_ms:>7.1f}x {max_diff:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Compare the precomputed charging time table with the model it was built from
+# Build the table first: python -m app.services.charging_table
+# Run from the processor directory: python -m benchmarks.charging_table
+import timeit
+import numpy as np
+from app.constants import TEMPERATURE, CHARGING_TIME_TABLE_PATH
+from app.services.charging_estimation import load_charging_time_model
+from app.services.charging_predictor import ChargingTimePredictor
+from app.services.charging_table import ChargingTimeTable, CHARGER_POWERS_KW
+
+SIZES = (10, 100, 1000)
+SAMPLES = 20_000
+REPEAT = 5
+
+
+def make_inputs(n, ev_models, seed=42, fractional=False):
+    # Like get_estimate_charging_time: integer SoC at arrival, desired SoC as clients send it, charger ratings
+    rng = np.random.default_rng(seed)
+    min_soc = rng.integers(2, 80, n).astype(np.float64)
+    desired_soc = rng.uniform(60, 100, n) if fractional else rng.integers(60, 101, n).astype(np.float64)
+    return (
+        ev_models[rng.integers(0, len(ev_models))],
+        min_soc,
+        np.maximum(desired_soc - min_soc, 0),
+        rng.choice(CHARGER_POWERS_KW, n).astype(np.float64) * 1000,
+    )
+
+
+def main():
+    predictor = ChargingTimePredictor(load_charging_time_model())
+    table = ChargingTimeTable(CHARGING_TIME_TABLE_PATH, fallback=lambda: predictor)
+    ev_models = sorted(predictor.categories)
+
+    # Accuracy over many EV models, in the minutes the API returns. Integer SoC pairs are grid points.
+    for fractional in (False, True):
+        errors = []
+        for i in range(SAMPLES // 100):
+            ev_model, min_soc, soc_diff, power = make_inputs(100, ev_models, seed=i, fractional=fractional)
+            model_min = np.round(predictor.predict(ev_model, min_soc, soc_diff, power, TEMPERATURE) / 60)
+            table_min = np.round(table.predict(ev_model, min_soc, soc_diff, power, TEMPERATURE) / 60)
+            errors.append(np.abs(model_min - table_min))
+        errors = np.concatenate(errors)
+        print(f"{'fractional' if fractional else 'integer':>10} desired SoC, abs error min: mean {errors.mean():.2f}, "
+              f"p95 {np.percentile(errors, 95):.0f}, max {errors.max():.0f}, exact {np.mean(errors == 0) * 100:.1f}%")
+
+    print(f"{'stations':>8} {'model ms':>10} {'table ms':>10} {'speedup':>8}")
+    for n in SIZES:
+        ev_model, min_soc, soc_diff, power = make_inputs(n, ev_models)
+        number = max(REPEAT, 2000 // n)
+        model_ms = min(timeit.repeat(lambda: predictor.predict(ev_model, min_soc, soc_diff, power, TEMPERATURE),
+                                     number=1, repeat=number)) * 1000
+        table_ms = min(timeit.repeat(lambda: table.predict(ev_model, min_soc, soc_diff, power, TEMPERATURE),
+                                     number=1, repeat=number)) * 1000
+        print(f"{n:>8} {model_ms:>10.3f} {table_ms:>10.3f} {model_ms / table_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# Compare the geopandas Web Mercator buffer with the UTM corridor buffer
+# Run from the processor directory: python -m benchmarks.corridor
+import timeit
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import LineString
+from app.constants import BUFFERED_ZONE
+from app.services.corridor import buffer_corridor, project_route
+
+SIZES = (1_000, 10_000)
+
+
+def make_route(n, seed=42):
+    # Wiggly Helsinki -> Lahti like polyline
+    rng = np.random.default_rng(seed)
+    lon = np.linspace(24.94, 25.66, n) + rng.normal(0, 0.0005, n).cumsum() * 0.05
+    lat = np.linspace(60.17, 60.98, n) + rng.normal(0, 0.0005, n).cumsum() * 0.05
+    return np.column_stack((lon, lat)).tolist()
+
+
+def legacy_buffer_route(route_coords):
+    gdf = gpd.GeoDataFrame(geometry=[LineString(route_coords)], crs="EPSG:4326").to_crs(epsg=3857)
+    buffered = gdf.buffer(BUFFERED_ZONE)
+    return gpd.GeoDataFrame(geometry=buffered, crs="EPSG:3857").to_crs(epsg=4326).geometry.union_all()
+
+
+def true_width_m(polygon, route_coords):
+    # Mean distance from the route to the buffer boundary, measured in the local UTM zone
+    line, _ = project_route(route_coords)
+    boundary, _ = project_route(np.asarray(polygon.exterior.coords))
+    sample = [boundary.interpolate(d) for d in np.linspace(0, boundary.length, 500)]
+    return float(np.mean([line.distance(p) for p in sample]))
+
+
+def main():
+    print(f"{'vertices':>8} {'impl':>7} {'ms':>8} {'wkt KiB':>8} {'width m':>8}")
+
+    for n in SIZES:
+        route = make_route(n)
+        for name, fn in (("legacy", legacy_buffer_route), ("utm", buffer_corridor)):
+            polygon = fn(route)
+            ms = min(timeit.repeat(lambda: fn(route), number=1, repeat=5)) * 1000
+            print(f"{n:>8} {name:>7} {ms:>8.1f} {len(polygon.wkt) / 1024:>8.1f} {true_width_m(polygon, route):>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
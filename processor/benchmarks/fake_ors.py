@@ -0,0 +1,149 @@
+# Stand-in for OpenRouteService used by benchmarks.load_test
+# Answers directions and matrix calls in-process, from a recording when one matches, otherwise synthesized
+# Also runs as an HTTP server for multi-process benchmarks: python -m benchmarks.fake_ors --port 8090
+import asyncio
+import json
+import random
+import zlib
+import httpx
+import numpy as np
+from app.services.route_sampling import haversine_km
+
+ROAD_FACTOR = 1.3  # Road distance over straight-line distance
+SPEED_KMH = 80.0
+VERTEX_SPACING_KM = 0.1
+MAX_VERTICES = 5000
+STEP_VERTICES = 50
+
+
+def synthesize_directions(coordinates):
+    # Wiggly polyline between the two points, one vertex per ~100 m, split into ORS-style steps
+    (lon1, lat1), (lon2, lat2) = coordinates[0][:2], coordinates[-1][:2]
+    straight_km = float(haversine_km(lon1, lat1, lon2, lat2))
+    n = int(min(MAX_VERTICES, max(2, straight_km * ROAD_FACTOR / VERTEX_SPACING_KM)))
+
+    rng = np.random.default_rng(zlib.crc32(json.dumps(coordinates).encode()))  # Same route for the same request
+    t = np.linspace(0, 1, n)
+    bend = np.sin(t * np.pi) * rng.normal(0, 0.02)  # Same sideways bend for the whole route
+    lon = lon1 + (lon2 - lon1) * t + bend + rng.normal(0, 0.0002, n) * (t > 0) * (t < 1)
+    lat = lat1 + (lat2 - lat1) * t - bend + rng.normal(0, 0.0002, n) * (t > 0) * (t < 1)
+
+    segment_km = haversine_km(lon[:-1], lat[:-1], lon[1:], lat[1:])
+    bounds = list(range(0, n - 1, STEP_VERTICES)) + [n - 1]
+    steps = [
+        {
+            "way_points": [a, b],
+            "distance": float(segment_km[a:b].sum() * 1000),
+            "duration": float(segment_km[a:b].sum() / SPEED_KMH * 3600)
+        } for a, b in zip(bounds[:-1], bounds[1:])
+    ]
+
+    return {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": np.column_stack((lon, lat)).round(6).tolist()},
+            "properties": {
+                "segments": [{"steps": steps}],
+                "summary": {
+                    "distance": float(segment_km.sum() * 1000),
+                    "duration": float(segment_km.sum() / SPEED_KMH * 3600)
+                }
+            }
+        }]
+    }
+
+
+def synthesize_matrix(body):
+    locations = np.asarray(body["locations"], dtype=np.float64)
+    sources = locations[body.get("sources", range(len(locations)))]
+    destinations = locations[body.get("destinations", range(len(locations)))]
+
+    km = haversine_km(sources[:, None, 0], sources[:, None, 1], destinations[None, :, 0], destinations[None, :, 1])
+    km = km * ROAD_FACTOR
+
+    return {
+        "durations": np.round(km / SPEED_KMH * 3600, 1).tolist(),
+        "distances": np.round(km, 3).tolist()
+    }
+
+
+def recording_key(path, body):
+    return path, json.dumps(body, sort_keys=True)
+
+
+class FakeOrsTransport(httpx.AsyncBaseTransport):
+    """httpx transport answering /v2/directions and /v2/matrix like ORS, after a simulated latency."""
+
+    def __init__(self, latency_ms=80.0, jitter=0.5, recording=None, error_rate=0.0, seed=42):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.recorded = {}
+        self.calls = {"directions": 0, "matrix": 0, "recorded": 0, "errors": 0}
+
+        # recording: JSONL of {"path": ..., "body": ..., "response": ...}, e.g. captured from the real ORS
+        if recording:
+            with open(recording) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recorded[recording_key(entry["path"], entry["body"])] = entry["response"]
+
+    async def handle_async_request(self, request):
+        body = json.loads(await request.aread())
+        path = request.url.path
+        endpoint = "directions" if "/directions/" in path else "matrix"
+        self.calls[endpoint] += 1
+
+        # Latency uniformly within +-jitter of the mean
+        await asyncio.sleep(self.latency_ms * self.rng.uniform(1 - self.jitter, 1 + self.jitter) / 1000)
+
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.calls["errors"] += 1
+            return httpx.Response(503, json={"error": "Simulated upstream failure"})
+
+        recorded = self.recorded.get(recording_key(path, body))
+        if recorded is not None:
+            self.calls["recorded"] += 1
+            return httpx.Response(200, json=recorded)
+
+        # Off the event loop, the app being measured should not pay for the stand-in's CPU time
+        if endpoint == "directions":
+            return httpx.Response(200, json=await asyncio.to_thread(synthesize_directions, body["coordinates"]))
+
+        return httpx.Response(200, json=await asyncio.to_thread(synthesize_matrix, body))
+
+
+def create_app(transport):
+    # ASGI app serving the transport over HTTP, for app.server workers in other processes
+    from fastapi import FastAPI, Request, Response
+
+    app = FastAPI()
+
+    @app.post("/v2/{path:path}")
+    async def ors(request: Request):
+        response = await transport.handle_async_request(
+            httpx.Request("POST", str(request.url), content=await request.body())
+        )
+        return Response(response.content, status_code=response.status_code, media_type="application/json")
+
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenRouteService over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--recording")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(FakeOrsTransport(args.latency_ms, args.jitter, args.recording, args.error_rate)),
+                host=args.host, port=args.port, log_level="warning")
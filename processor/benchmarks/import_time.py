@@ -0,0 +1,52 @@
+# Measure the import cost of the app with `python -X importtime`
+# Run from the processor directory: python -m benchmarks.import_time [--max-ms 1500] [--top 15]
+import argparse
+import os
+import subprocess
+import sys
+
+
+def measure(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, "PYTHONWARNINGS": "ignore"}
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        # Nested imports are indented, keep the indentation to tell them apart
+        timings.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-ms", type=float, default=None, help="Exit non-zero when the import is slower")
+    args = parser.parse_args()
+
+    timings = measure(args.module)
+    total_ms = next(cumulative for name, _, cumulative in timings if name.strip() == args.module) / 1000
+
+    print(f"import {args.module}: {total_ms:.1f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    # Direct and second-level imports, where a heavy dependency usually shows up
+    shallow = [t for t in timings if 0 < len(t[0]) - len(t[0].lstrip()) <= 4]
+    for name, self_us, cumulative_us in sorted(shallow, key=lambda t: -t[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name.strip()}")
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"Import time regression: {total_ms:.1f} ms > {args.max_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Throwaway PostGIS database for benchmarks.load_test, built from database/init.sql and inserts.sql
+# Needs a PostGIS server and a role allowed to CREATE DATABASE
+from pathlib import Path
+import asyncpg
+from sqlalchemy.engine import make_url
+
+DATABASE_DIR = Path(__file__).resolve().parents[2] / "database"
+
+# inserts.sql has no orders or reservations, add some for the ETA endpoints
+SEED_RESERVATIONS = """
+SELECT setseed(0.42);
+
+INSERT INTO users (username, email, password)
+VALUES ('load-test', 'load-test@example.com', 'x');
+
+INSERT INTO orders (customer_id, restaurant_id, total_price)
+SELECT (SELECT max(user_id) FROM users), 1 + floor(random() * (SELECT count(*) FROM restaurants))::int, 20
+FROM generate_series(1, {count});
+
+-- Spread over the next 6 hours, 30-90 min each, so the availability filter has something to drop
+INSERT INTO reservations (order_id, charger_id, reservation_start, reservation_end)
+SELECT order_id, charger_id, start, start + (30 + floor(random() * 60)::int) * interval '1 minute'
+FROM (
+    SELECT order_id, 1 + floor(random() * (SELECT count(*) FROM chargers))::int AS charger_id,
+           now() + floor(random() * 360)::int * interval '1 minute' AS start
+    FROM orders
+) seeded;
+"""
+
+
+def asyncpg_dsn(url):
+    # asyncpg takes plain postgresql:// URLs
+    return make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def database_url(url, name):
+    return make_url(url).set(database=name).render_as_string(hide_password=False)
+
+
+async def create_fixture(admin_url, name, reservations=500):
+    """Create database `name` next to admin_url, seed it and return its URL."""
+    admin = await asyncpg.connect(asyncpg_dsn(admin_url))
+    try:
+        await admin.execute(f'DROP DATABASE IF EXISTS "{name}"')
+        await admin.execute(f'CREATE DATABASE "{name}"')
+    finally:
+        await admin.close()
+
+    url = database_url(admin_url, name)
+    conn = await asyncpg.connect(asyncpg_dsn(url))
+    try:
+        # Multi-statement scripts go through the simple query protocol
+        await conn.execute((DATABASE_DIR / "init.sql").read_text())
+        await conn.execute((DATABASE_DIR / "inserts.sql").read_text())
+        await conn.execute(SEED_RESERVATIONS.format(count=int(reservations)))
+        await conn.execute("ANALYZE")
+    finally:
+        await conn.close()
+
+    return url
+
+
+async def drop_fixture(admin_url, name):
+    admin = await asyncpg.connect(asyncpg_dsn(admin_url))
+    try:
+        await admin.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+    finally:
+        await admin.close()
+
+
+async def fixture_data(url):
+    # What the request generator samples from
+    conn = await asyncpg.connect(asyncpg_dsn(url))
+    try:
+        stations = await conn.fetch(
+            "SELECT station_id, ST_X(location::geometry) AS lon, ST_Y(location::geometry) AS lat FROM stations"
+        )
+        cuisines = await conn.fetch("SELECT DISTINCT unnest(cuisines) AS cuisine FROM restaurants")
+        reservation_ids = await conn.fetch("SELECT reservation_id FROM reservations")
+    finally:
+        await conn.close()
+
+    return {
+        "stations": [(r["station_id"], r["lon"], r["lat"]) for r in stations],
+        "cuisines": sorted(r["cuisine"] for r in cuisines),
+        "reservation_ids": [r["reservation_id"] for r in reservation_ids],
+    }
@@ -0,0 +1,98 @@
+# Compare the pure-Python route expansion/sampling loop with the NumPy sampler
+# Run from the processor directory: python -m benchmarks.route_sampling
+import timeit
+from math import radians, sin, cos, sqrt, atan2
+import numpy as np
+from app.services.route_sampling import expand_route, sample_route
+
+VERTICES = 20_000
+STEPS = 400
+INTERVALS_MIN = (1, 5, 15)
+
+
+def make_route(n, n_steps, seed=42):
+    # Helsinki -> Tampere like polyline split into ORS-style steps
+    rng = np.random.default_rng(seed)
+    lon = np.linspace(24.94, 23.76, n) + rng.normal(0, 0.0002, n)
+    lat = np.linspace(60.17, 61.50, n) + rng.normal(0, 0.0002, n)
+    bounds = np.linspace(0, n - 1, n_steps + 1).astype(int)
+    steps = [{"way_points": [int(a), int(b)], "duration": float(rng.uniform(20, 60) * (b - a) / 50)}
+             for a, b in zip(bounds[:-1], bounds[1:])]
+    return {"features": [{
+        "geometry": {"coordinates": np.column_stack((lon, lat)).tolist()},
+        "properties": {"segments": [{"steps": steps}]}
+    }]}
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    # The scalar helper the legacy loop used, formerly in app.services.open_route
+    R = 6371.0  # Earth radius in km
+    dlon = radians(lon2 - lon1)
+    dlat = radians(lat2 - lat1)
+
+    a = sin(dlat / 2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+
+    return R * c
+
+
+def legacy_route_locations(route, interval_min):
+    # The pre-vectorization implementation, kept here as the baseline
+    geometry = route["features"][0]["geometry"]["coordinates"]
+    steps = route["features"][0]["properties"]["segments"][0]["steps"]
+    interval_sec = interval_min * 60
+    current_time = 0
+    current_dist = 0
+    next_sample_time = 0
+    expanded = []
+
+    for step in steps:
+        start_idx, end_idx = step["way_points"]
+        step_coords = geometry[start_idx:end_idx + 1]
+        duration = step["duration"]
+        per_segment_time = duration / (len(step_coords) - 1) if len(step_coords) > 1 else duration
+        prev_lon, prev_lat = step_coords[0]
+        expanded.append((prev_lon, prev_lat, current_time, current_dist))
+        for lon, lat in step_coords[1:]:
+            current_dist += haversine(prev_lon, prev_lat, lon, lat)
+            current_time += per_segment_time
+            expanded.append((lon, lat, current_time, current_dist))
+            prev_lon, prev_lat = lon, lat
+
+    samples = []
+    ptr = 0
+    while next_sample_time <= expanded[-1][2]:
+        while ptr < len(expanded) - 1 and expanded[ptr][2] < next_sample_time:
+            ptr += 1
+        lon, lat, _, dist = expanded[ptr]
+        samples.append({"lat": lat, "lon": lon, "time_min": round(next_sample_time / 60),
+                        "distance_km": round(dist, 3)})
+        next_sample_time += interval_sec
+
+    return samples
+
+
+def numpy_route_locations(route, interval_min):
+    return sample_route(expand_route(route), interval_min * 60)
+
+
+def main():
+    route = make_route(VERTICES, STEPS)
+    print(f"{VERTICES} vertices, {STEPS} steps")
+    print(f"{'interval':>8} {'samples':>8} {'legacy ms':>10} {'numpy ms':>9} {'speedup':>8} {'max diff km':>12}")
+
+    for interval in INTERVALS_MIN:
+        legacy = legacy_route_locations(route, interval)
+        vectorized = numpy_route_locations(route, interval)
+        assert len(legacy) == len(vectorized)
+        # Legacy snaps to the next vertex, the sampler interpolates, so distances differ by < 1 segment
+        max_diff = max(abs(a["distance_km"] - b["distance_km"]) for a, b in zip(legacy, vectorized))
+
+        legacy_ms = min(timeit.repeat(lambda: legacy_route_locations(route, interval), number=1, repeat=5)) * 1000
+        numpy_ms = min(timeit.repeat(lambda: numpy_route_locations(route, interval), number=1, repeat=5)) * 1000
+        print(f"{interval:>8} {len(vectorized):>8} {legacy_ms:>10.2f} {numpy_ms:>9.2f} "
+              f"{legacy_ms / numpy_ms:>7.1f}x {max_diff:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
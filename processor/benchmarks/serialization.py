@@ -0,0 +1,76 @@
+# Compare rendering a large /get-filtered-stations result: dicts through FastAPI's jsonable_encoder and
+# json.dumps (the old path) against the slotted result models through orjson
+# Run from the processor directory: python -m benchmarks.serialization
+import json
+import random
+import timeit
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from app.models.response_models import RestaurantResult, ChargerResult, dumps
+from app.models.station_batch import StationBatch
+
+SIZES = (10, 100, 1000)
+REPEAT = 5
+
+
+def make_batch(n, seed=42):
+    rng = random.Random(seed)
+    batch = StationBatch.from_rows(
+        list(range(n)),
+        [24.9 + rng.random() for _ in range(n)],
+        [60.2 + rng.random() for _ in range(n)],
+        [f"Station {i}" for i in range(n)],
+        [f"Street {i}, Helsinki" for i in range(n)],
+        [[RestaurantResult(i * 3 + j, i, f"Restaurant {j}", "Street 1", ["italian", "pizza"]) for j in range(3)]
+         for i in range(n)],
+        [[ChargerResult(i * 2 + j, "CCS", rng.choice((50, 150, 300))) for j in range(2)] for i in range(n)],
+    )
+    return batch.with_columns(
+        travel_time_min=np.array([rng.randint(1, 300) for _ in range(n)], dtype=np.int64),
+        distance_km=np.array([round(rng.uniform(1, 450), 2) for _ in range(n)]),
+        soc_at_arrival=np.array([rng.randint(5, 80) for _ in range(n)], dtype=np.int64),
+        estimate_charging_time_min=np.array([rng.randint(5, 60) for _ in range(n)], dtype=np.int64),
+    )
+
+
+def as_dicts(batch):
+    # The shape the dict pipeline handed to FastAPI
+    return [
+        {
+            "station_id": st.station_id,
+            "name": st.name,
+            "address": st.address,
+            "restaurants": [
+                {"restaurant_id": r.restaurant_id, "station_id": r.station_id, "name": r.name,
+                 "address": r.address, "cuisines": r.cuisines} for r in st.restaurants
+            ],
+            "chargers": [{"charger_id": c.charger_id, "type": c.type, "max_power": c.max_power} for c in st.chargers],
+            "travel_time_min": st.travel_time_min,
+            "distance_km": st.distance_km,
+            "soc_at_arrival": st.soc_at_arrival,
+            "estimate_charging_time_min": st.estimate_charging_time_min,
+        } for st in batch.results()
+    ]
+
+
+def legacy_render(stations):
+    return json.dumps(jsonable_encoder(stations), separators=(",", ":")).encode()
+
+
+def main():
+    print(f"{'stations':>8} {'legacy ms':>10} {'orjson ms':>10} {'speedup':>8}")
+
+    for n in SIZES:
+        batch = make_batch(n)
+        stations = as_dicts(batch)
+        assert json.loads(legacy_render(stations)) == json.loads(dumps(batch.results())), "outputs differ"
+
+        number = max(REPEAT, 2000 // n)
+        legacy_ms = min(timeit.repeat(lambda: legacy_render(stations), number=number, repeat=REPEAT)) / number * 1000
+        # Includes building the result models from the columns
+        orjson_ms = min(timeit.repeat(lambda: dumps(batch.results()), number=number, repeat=REPEAT)) / number * 1000
+        print(f"{n:>8} {legacy_ms:>10.3f} {orjson_ms:>10.3f} {legacy_ms / orjson_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Compare PostGIS station lookups with the in-memory station catalog
+# Needs a seeded database (database/init.sql + inserts.sql) at DATABASE_URL
+# Run from the processor directory: python -m benchmarks.station_lookup
+import asyncio
+import random
+import statistics
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dependencies.database import engine
+from app.services.corridor import buffer_corridor
+from app.services.database import get_stations_from_db, get_station_catalog_rows
+from app.services.station_catalog import StationCatalog
+
+CORRIDORS = 50
+REPEAT = 5
+CUISINES = ["italian", "asian", "regional"]
+CONNECTOR_TYPE = "CCS"
+
+
+def make_corridors(stations, n, seed=42):
+    # Straight-line corridors between random station pairs, buffered like a real route
+    rng = random.Random(seed)
+    corridors = []
+    for _ in range(n):
+        a, b = rng.sample(stations, 2)
+        corridors.append(buffer_corridor([(a.lon, a.lat), (b.lon, b.lat)]))
+    return corridors
+
+
+async def timed(fn, corridors):
+    timings = []
+    results = []
+    for polygon in corridors:
+        best = None
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            result = fn(polygon)
+            if asyncio.iscoroutine(result):
+                result = await result
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best * 1000)
+        results.append(result)
+    return timings, results
+
+
+async def main():
+    catalog = StationCatalog()
+
+    async with AsyncSession(engine) as session:
+        start = time.perf_counter()
+        await catalog.load(session)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        stations, _, _ = await get_station_catalog_rows(session)
+        corridors = make_corridors(stations, CORRIDORS)
+
+        db_ms, db_results = await timed(lambda p: get_stations_from_db(session, p, CUISINES, CONNECTOR_TYPE),
+                                        corridors)
+
+    memory_ms, memory_results = await timed(lambda p: catalog.query(p, CUISINES, CONNECTOR_TYPE), corridors)
+    await engine.dispose()
+
+    for db, memory in zip(db_results, memory_results):
+        assert set(db.station_id.tolist()) == set(memory.station_id.tolist()), "catalog and DB disagree"
+
+    print(f"catalog load: {load_ms:.1f} ms for {len(stations)} stations")
+    print(f"{'mode':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, timings in (("db", db_ms), ("memory", memory_ms)):
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        print(f"{name:>7} {statistics.median(timings):>8.3f} {p95:>8.3f} {max(timings):>8.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
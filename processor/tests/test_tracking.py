@@ -0,0 +1,41 @@
+import asyncio
+from app.services import open_route
+from app.services.tracking import TrackingSessionStore
+
+
+def straight_route(source, destination):
+    # ORS directions geojson, one step from source to destination
+    return {"features": [{
+        "geometry": {"coordinates": [list(source), list(destination)]},
+        "properties": {"segments": [{"steps": [{"way_points": [0, 1], "duration": 3600}]}]},
+    }]}
+
+
+def test_reroute_inside_the_origin_cache_cell(tmp_path, monkeypatch):
+    sources = []
+
+    async def directions(coordinates, profile="driving-car", timeout=None):
+        sources.append(tuple(coordinates[0]))
+        return straight_route(*coordinates)
+
+    monkeypatch.setattr(open_route.client, "directions", directions)
+    store = TrackingSessionStore(str(tmp_path / "tracking.sqlite3"), timeout=1.0, ttl=60, maxsize=10,
+                                 off_route_distance=300)
+
+    # ~550 m north of the route, still in the start's route cache cell
+    start, destination = (25.0, 59.99751), (26.0, 59.99751)
+    moved = (25.0, 60.00249)
+    assert open_route.route_cache.key(start, destination) == open_route.route_cache.key(moved, destination)
+
+    async def drive():
+        eta = await store.start(start, destination)
+        session = await store.get(eta["session_id"])
+        return await store.update(session, moved), await store.update(session, moved)
+
+    first, second = asyncio.run(drive())
+
+    assert first["rerouted"]
+    assert sources[-1] == moved
+    # The new route starts where the car is, so the next update is back on it
+    assert not second["rerouted"]
+    assert store.reroutes == 1